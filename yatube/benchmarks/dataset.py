@@ -0,0 +1,129 @@
+"""Генерация синтетических данных для нагрузочных замеров.
+
+Авторство записей, комментарии и подписки распределены по закону Ципфа:
+немногие популярные авторы пишут большую часть записей и собирают
+большую часть подписчиков, как в живом сообществе. Все вставляется
+пачками через bulk_create без сигналов; ленты, счетчики профилей и
+версии затронутых страниц обновляются один раз в конце.
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from core.models import keep_pub_dates
+from posts import cache
+from posts.graph import follow_graph
+from posts.models import Comment, Follow, Group, Post, User
+
+USERNAME_PREFIX = 'bench_'
+GROUP_PREFIX = 'bench-'
+TEXTS = 1000
+DAYS = 365
+
+
+def zipf(count, exponent):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def insert(objs, batch_size, create):
+    objs = iter(objs)
+    while True:
+        batch = list(islice(objs, batch_size))
+        if not batch:
+            return
+        with transaction.atomic():
+            create(batch)
+
+
+def generate(users=1000, posts=10_000, groups=20, comments=10_000,
+             follows=20, skew=1.1, seed=0, batch_size=5000, stdout=None):
+    """Создает набор данных и возвращает число созданных строк."""
+    rng = random.Random(seed)
+    faker = Faker('ru_RU')
+    faker.seed_instance(seed)
+    texts = [faker.paragraph(nb_sentences=3) for _ in range(TEXTS)]
+    now = timezone.now()
+
+    def pub_date():
+        return now - timedelta(seconds=rng.randrange(DAYS * 24 * 3600))
+
+    password = make_password(None)
+    insert(
+        (User(username=f'{USERNAME_PREFIX}{i}', password=password)
+         for i in range(users)),
+        batch_size,
+        lambda batch: User.objects.bulk_create(batch, ignore_conflicts=True)
+    )
+    Group.objects.bulk_create([
+        Group(title=f'Группа {i}', slug=f'{GROUP_PREFIX}{i}',
+              description=rng.choice(texts))
+        for i in range(groups)
+    ], ignore_conflicts=True)
+    # Порядок пользователей задает ранг популярности.
+    user_ids = list(User.objects.filter(
+        username__startswith=USERNAME_PREFIX).order_by('pk').values_list(
+        'pk', flat=True))
+    group_ids = list(Group.objects.filter(
+        slug__startswith=GROUP_PREFIX).values_list('pk', flat=True)) or [None]
+    weights = zipf(len(user_ids), skew)
+
+    def author():
+        return rng.choices(user_ids, cum_weights=weights)[0]
+
+    with keep_pub_dates(Post, Comment):
+        insert(
+            (Post(author_id=author(), text=rng.choice(texts),
+                  group_id=rng.choice(group_ids + [None]),
+                  pub_date=pub_date())
+             for _ in range(posts)),
+            batch_size,
+            lambda batch: Post.objects.bulk_create(batch, send_signal=False)
+        )
+        post_ids = list(Post.objects.filter(
+            author__username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+        post_weights = zipf(len(post_ids), skew)
+        insert(
+            (Comment(post_id=rng.choices(post_ids,
+                                         cum_weights=post_weights)[0],
+                     author_id=rng.choice(user_ids),
+                     text=rng.choice(texts)[:200],
+                     pub_date=pub_date())
+             for _ in range(comments if post_ids else 0)),
+            batch_size,
+            Comment.objects.bulk_create
+        )
+    insert(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id in user_ids
+         for author_id in {author() for _ in range(follows)} - {user_id}),
+        batch_size,
+        lambda batch: Follow.objects.bulk_create(
+            batch, ignore_conflicts=True, send_signal=False)
+    )
+    # Команды обновляют и страницы затронутых авторов.
+    call_command('rebuild_timelines', stdout=stdout)
+    call_command('reconcile_profile_stats', stdout=stdout)
+    follow_graph.invalidate()
+    cache.bump(cache.GLOBAL, cache.GROUPS, *(
+        cache.group_scope(slug) for slug in Group.objects.filter(
+            slug__startswith=GROUP_PREFIX).values_list('slug', flat=True)
+    ), *map(cache.comments_scope, post_ids))
+    return {
+        'users': len(user_ids),
+        'groups': Group.objects.filter(
+            slug__startswith=GROUP_PREFIX).count(),
+        'posts': len(post_ids),
+        'comments': Comment.objects.filter(
+            author__username__startswith=USERNAME_PREFIX).count(),
+        'follows': Follow.objects.filter(
+            user__username__startswith=USERNAME_PREFIX).count(),
+    }
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.dataset import generate
+
+
+class Command(BaseCommand):
+    help = 'Создает синтетический набор данных для замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=10_000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Сколько раз каждый пользователь выбирает автора'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = generate(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            skew=options['skew'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{name}: {count}' for name, count in counts.items())
+            + f' за {time.perf_counter() - started:.1f} с'
+        ))
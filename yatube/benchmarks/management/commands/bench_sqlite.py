@@ -0,0 +1,123 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply_pragmas
+
+ROWS = 10_000
+
+SCHEMA = '''
+CREATE TABLE posts (
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    pub_date REAL NOT NULL
+);
+CREATE INDEX posts_author_pub_date ON posts (author_id, pub_date DESC);
+'''
+
+READ = '''
+SELECT id, text FROM posts WHERE author_id = ?
+ORDER BY pub_date DESC LIMIT 10
+'''
+WRITE = 'INSERT INTO posts (author_id, text, pub_date) VALUES (?, ?, ?)'
+
+# Профиль: PRAGMA и держится ли соединение между «запросами».
+PROFILES = {
+    'stock': ({}, False),
+    'pragmas': (settings.SQLITE_PRAGMAS, False),
+    'tuned': (settings.SQLITE_PRAGMAS, True),
+}
+
+
+def connect(path, pragmas):
+    # Как у бэкенда Django: автокоммит и таймаут sqlite3 по умолчанию.
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def run_worker(args):
+    """Читает или пишет duration секунд; число операций и ошибок."""
+    profile, path, role, duration, seed = args
+    pragmas, persistent = PROFILES[profile]
+    rng = random.Random(seed)
+    connection = connect(path, pragmas) if persistent else None
+    ops = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        # Без постоянных соединений каждый запрос открывает свое.
+        current = connection or connect(path, pragmas)
+        try:
+            if role == 'read':
+                current.execute(READ, (rng.randrange(100),)).fetchall()
+            else:
+                current.execute(WRITE, (
+                    rng.randrange(100), 'x' * 200, time.time()))
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        finally:
+            if connection is None:
+                current.close()
+    return role, ops, errors
+
+
+def prepare(path, pragmas):
+    connection = connect(path, pragmas)
+    connection.executescript(SCHEMA)
+    with connection:
+        connection.executemany(WRITE, (
+            (i % 100, 'x' * 200, time.time() - i) for i in range(ROWS)
+        ))
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает чтение и запись SQLite из нескольких процессов '
+        'без настроек, с PRAGMA из settings и с постоянными соединениями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=3.0)
+        parser.add_argument(
+            '--profile', action='append', dest='profiles',
+            choices=tuple(PROFILES)
+        )
+
+    def handle(self, *args, **options):
+        readers, writers = options['readers'], options['writers']
+        duration = options['duration']
+        self.stdout.write(
+            f'{"profile":<8} {"reads/s":>10} {"writes/s":>10} '
+            f'{"errors":>7}   ({readers} читателей, {writers} писателей, '
+            f'{duration:g} с)'
+        )
+        for profile in options['profiles'] or PROFILES:
+            with tempfile.TemporaryDirectory() as location:
+                path = os.path.join(location, 'bench.sqlite3')
+                prepare(path, PROFILES[profile][0])
+                roles = ['read'] * readers + ['write'] * writers
+                with Pool(len(roles)) as pool:
+                    results = pool.map(run_worker, [
+                        (profile, path, role, duration, seed)
+                        for seed, role in enumerate(roles)
+                    ])
+            totals = {'read': 0, 'write': 0}
+            errors = 0
+            for role, ops, failed in results:
+                totals[role] += ops
+                errors += failed
+            self.stdout.write(
+                f'{profile:<8} {totals["read"] / duration:>10,.0f} '
+                f'{totals["write"] / duration:>10,.0f} {errors:>7}'
+            )
@@ -0,0 +1,65 @@
+import json
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from benchmarks.runner import PERCENTILES, run
+from posts.models import Comment, Follow, Post, User
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Замеряет страницы записей и пишет результаты в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Мерить ответы из кеша страниц'
+        )
+        parser.add_argument('--view', action='append', dest='views')
+        parser.add_argument('--output', help='Файл для результатов JSON')
+
+    def handle(self, *args, **options):
+        results = {
+            'started': timezone.now().isoformat(),
+            'revision': revision(),
+            'python': platform.python_version(),
+            'warm': options['warm'],
+            'dataset': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'views': run(
+                options['requests'], options['warm'], options['views']
+            ),
+        }
+        columns = [f'p{rank}_ms' for rank in PERCENTILES]
+        self.stdout.write(
+            f'{"view":<14}' + ''.join(f'{name:>10}' for name in columns)
+            + f'{"queries":>9}{"rss_kb":>10}'
+        )
+        for name, view in results['views'].items():
+            self.stdout.write(
+                f'{name:<14}'
+                + ''.join(f'{view[column]:>10.1f}' for column in columns)
+                + f'{view["queries_per_request"]:>9.1f}'
+                + f'{view["peak_rss_kb"]:>10}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
@@ -0,0 +1,120 @@
+"""Замеры страниц записей через тестовый клиент Django.
+
+Для каждой страницы считаются перцентили времени ответа, число запросов
+к базе на ответ и пиковый RSS процесса. Страницы выбираются по данным:
+самая большая группа, самый плодовитый автор, самая обсуждаемая запись
+и читатель с самой длинной лентой.
+"""
+import resource
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core.cache_backends import relocated
+from posts.models import Group, Post, TimelineEntry, User
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    index = max(0, -(-len(values) * rank // 100) - 1)
+    return values[index]
+
+
+def targets():
+    """{имя страницы: (URL, нужен ли вход)} для текущих данных."""
+    found = {'index': (reverse('posts:index'), False)}
+    group = Group.objects.annotate(
+        count=Count('posts')).order_by('-count').first()
+    if group:
+        found['group_posts'] = (
+            reverse('posts:group_list', args=[group.slug]), False)
+    author = User.objects.order_by(
+        '-profile_stats__posts_count').first()
+    if author:
+        found['profile'] = (
+            reverse('posts:profile', args=[author.username]), False)
+    post = Post.objects.annotate(
+        count=Count('comments')).order_by('-count').first()
+    if post:
+        found['post_detail'] = (
+            reverse('posts:post_detail', args=[post.pk]), False)
+    found['follow_index'] = (reverse('posts:follow_index'), True)
+    return found
+
+
+def reader():
+    """Пользователь с самой длинной лентой."""
+    user_id = TimelineEntry.objects.values('user').annotate(
+        count=Count('pk')).order_by('-count').values_list(
+        'user', flat=True).first()
+    return User.objects.filter(pk=user_id).first() or User.objects.first()
+
+
+def measure(client, url, requests, warm):
+    timings, queries = [], []
+    if warm:
+        client.get(url)
+    for _ in range(requests):
+        if not warm:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+        queries.append(len(captured))
+    timings.sort()
+    return {
+        'url': url,
+        'requests': requests,
+        **{f'p{rank}_ms': round(percentile(timings, rank), 3)
+           for rank in PERCENTILES},
+        'queries_per_request': sum(queries) / len(queries),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+@contextmanager
+def own_cache():
+    """Отдельный кеш на время замеров: его сброс перед холодными
+    запросами не трогает сессии, пользователей и лимиты сайта."""
+    directory = tempfile.mkdtemp(prefix='yatube-bench-')
+    try:
+        with override_settings(
+                CACHES=relocated(settings.CACHES, directory)):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(requests=50, warm=False, views=None):
+    """Замеряет страницы и возвращает результаты по именам страниц.
+
+    warm=False сбрасывает кеш перед каждым запросом и меряет путь до
+    базы; warm=True меряет ответы из кеша страниц. Кеш у замеров свой.
+    """
+    # Адрес не из INTERNAL_IPS, чтобы debug_toolbar не встраивался
+    # в ответы и не искажал замеры.
+    guest = Client(REMOTE_ADDR='192.0.2.1')
+    user = Client(REMOTE_ADDR='192.0.2.1')
+    results = {}
+    with own_cache():
+        user.force_login(reader())
+        for name, (url, login) in targets().items():
+            if views and name not in views:
+                continue
+            results[name] = measure(
+                user if login else guest, url, requests, warm)
+    return results
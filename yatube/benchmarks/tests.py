@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from benchmarks.dataset import generate
+from benchmarks.runner import percentile
+from posts.models import Post, TimelineEntry
+
+
+class BenchmarkTests(TestCase):
+    def test_generate(self):
+        """Генератор создает связанный набор данных с перекосом авторов."""
+        counts = generate(users=20, posts=200, groups=3, comments=50,
+                          follows=5, batch_size=30, stdout=StringIO())
+        self.assertEqual(counts['users'], 20)
+        self.assertEqual(counts['posts'], 200)
+        self.assertEqual(counts['comments'], 50)
+        self.assertGreater(counts['follows'], 0)
+        self.assertTrue(TimelineEntry.objects.exists())
+        top = Post.objects.filter(
+            author__username='bench_0').count()
+        self.assertGreater(top, 200 / 20)
+
+    def test_bench_views_writes_json(self):
+        """Замеры всех страниц пишутся в JSON."""
+        generate(users=10, posts=50, groups=2, comments=20, follows=3,
+                 stdout=StringIO())
+        cache.set('site:key', 1)
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('bench_views', requests=3, output=path,
+                     stdout=StringIO())
+        with open(path, encoding='utf-8') as results:
+            views = json.load(results)['views']
+        self.assertEqual(set(views), {
+            'index', 'group_posts', 'profile', 'post_detail', 'follow_index'
+        })
+        for name, view in views.items():
+            with self.subTest(view=name):
+                self.assertLessEqual(view['p50_ms'], view['p99_ms'])
+                self.assertGreater(view['queries_per_request'], 0)
+                self.assertGreater(view['peak_rss_kb'], 0)
+        # Холодные замеры сбрасывают свой кеш, а не кеш сайта.
+        self.assertEqual(cache.get('site:key'), 1)
+
+    def test_bench_sqlite_profiles(self):
+        """Сравнение SQLite выводит строку на каждый профиль."""
+        out = StringIO()
+        call_command('bench_sqlite', readers=1, writers=1, duration=0.2,
+                     stdout=out)
+        rows = out.getvalue().splitlines()[1:]
+        self.assertEqual(
+            [row.split()[0] for row in rows], ['stock', 'pragmas', 'tuned'])
+        for row in rows:
+            with self.subTest(profile=row.split()[0]):
+                reads, writes = row.split()[1:3]
+                self.assertGreater(int(reads.replace(',', '')), 0)
+                self.assertGreater(int(writes.replace(',', '')), 0)
+
+    def test_percentile(self):
+        """Перцентиль берется по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
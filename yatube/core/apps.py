@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth, slow_queries, sqlite  # noqa: F401
+        connection_created.connect(sqlite.configure)
+        connection_created.connect(slow_queries.install)
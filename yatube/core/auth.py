@@ -0,0 +1,58 @@
+"""Пользователь запроса из кеша.
+
+AuthenticationMiddleware на каждом запросе достает пользователя по id
+из сессии. CachedModelBackend отдает его из кеша, а в базу идет только
+при промахе. Сессии хранит cached_db, так что страница авторизованного
+посетителя не делает ни одного запроса ради входа.
+
+Запись в кеше удаляется при любом сохранении пользователя (смена
+пароля в PasswordChangeView, обновление last_login при входе, правка в
+админке), при удалении и при выходе. Изменения мимо save() (update())
+видны не позже AUTH_USER_CACHE_TIMEOUT.
+
+При промахе пользователь читается с основной базы, даже когда запросу
+разрешены реплики: объект из кеша живет дольше запроса, и его _state.db
+не должен указывать на реплику.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+USER_KEY = 'auth:user:{}'
+
+User = get_user_model()
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User._default_manager.using(
+                    DEFAULT_DB_ALIAS).get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_logged_out_forget(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
@@ -0,0 +1,87 @@
+"""Накопление событий в памяти процесса с сохранением пачками.
+
+Batch копит значения по ключам, а save раз в interval секунд сохраняет
+их одной пачкой в фоновом потоке. Таймер взводится после фиксации
+транзакции, в которой пришло первое событие пачки, поэтому пачка
+сохраняется и тогда, когда за ней больше не приходит запросов. Если
+save падает, значения возвращаются в буфер и уходят со следующей
+пачкой.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class Batch:
+    def __init__(self, name, save, merge, interval_setting):
+        """save(pending) сохраняет пачку {ключ: значение}, merge(a, b)
+        объединяет два значения ключа (a может быть None)."""
+        self.name = name
+        self.save = save
+        self.merge = merge
+        self.interval_setting = interval_setting
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+        self._pid = os.getpid()
+
+    def update(self, key, change):
+        """Заменяет значение ключа на change(значение или None)."""
+        with self._lock:
+            self._check_fork()
+            self._pending[key] = change(self._pending.get(key))
+            armed = self._timer is not None
+        if not armed:
+            transaction.on_commit(self._arm)
+
+    def flush(self):
+        """Сохраняет накопленное процессом."""
+        with self._lock:
+            self._check_fork()
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            self.save(pending)
+        except BaseException:
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] = self.merge(
+                        self._pending.get(key), value)
+            raise
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # Значения и таймер родителя достались процессу при fork.
+            self._pending = {}
+            self._timer = None
+            self._pid = os.getpid()
+
+    def _arm(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(
+                getattr(settings, self.interval_setting), self._run)
+            self._timer.name = self.name
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Не удалось сохранить пачку %s', self.name)
+        finally:
+            connections.close_all()
+            with self._lock:
+                # Пока шло сохранение, таймер не взводился.
+                self._timer = None
+                rearm = bool(self._pending)
+            if rearm:
+                self._arm()
@@ -0,0 +1,269 @@
+"""Кеш в файле SQLite, общий для всех процессов одного сервера.
+
+LocMemCache у каждого WSGI-процесса свой: копии одних и тех же страниц
+занимают память в каждом процессе, а сброс версии в одном процессе не
+виден остальным. Этот бэкенд хранит записи в одном файле SQLite в
+режиме WAL, поэтому читатели не блокируют писателя, а изменения сразу
+видны всем процессам.
+
+Число записей ограничено MAX_ENTRIES, при переполнении вытесняются
+давно не читанные записи (LRU). Время чтения обновляется не чаще раза
+в ACCESS_RESOLUTION секунд, чтобы чтения почти не превращались в записи.
+"""
+import copy
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache
+BEGIN UPDATE cache_size SET entries = entries + 1; END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache
+BEGIN UPDATE cache_size SET entries = entries - 1; END;
+'''
+
+UPSERT = '''
+INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed
+'''
+
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_VARIABLES = 900
+
+INT_LIMIT = 2 ** 63
+
+
+class SQLiteCache(BaseCache):
+    ACCESS_RESOLUTION = 1.0
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция записи: BEGIN IMMEDIATE сразу берет блокировку."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    @staticmethod
+    def _encode(value):
+        # Целые числа храним как есть, чтобы incr работал внутри SQLite.
+        if type(value) is int and -INT_LIMIT <= value < INT_LIMIT:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _cull(self, connection, now):
+        entries, = connection.execute(
+            'SELECT entries FROM cache_size').fetchone()
+        if entries <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,))
+        entries, = connection.execute(
+            'SELECT entries FROM cache_size').fetchone()
+        if entries <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (max(entries // self._cull_frequency,
+                 entries - self._max_entries),)
+        )
+
+    def _touch_accessed(self, connection, keys, now):
+        connection.execute(
+            f'UPDATE cache SET accessed = ? WHERE accessed < ? '
+            f'AND key IN ({",".join("?" * len(keys))})',
+            (now, now - self.ACCESS_RESOLUTION, *keys)
+        )
+
+    def _get_many(self, keys):
+        """Возвращает {ключ: значение} для живых записей."""
+        connection = self._connection()
+        now = time.time()
+        found = {}
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            rows = connection.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({",".join("?" * len(chunk))}) '
+                f'AND (expires IS NULL OR expires > ?)',
+                (*chunk, now)
+            ).fetchall()
+            stale = [
+                key for key, _, accessed in rows
+                if accessed < now - self.ACCESS_RESOLUTION
+            ]
+            if stale:
+                self._touch_accessed(connection, stale, now)
+            found.update((key, value) for key, value, _ in rows)
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self._get_many([key])
+        if key not in found:
+            return default
+        return self._decode(found[key])
+
+    def get_many(self, keys, version=None):
+        keys_map = {self._key(key, version): key for key in keys}
+        return {
+            keys_map[key]: self._decode(value)
+            for key, value in self._get_many(list(keys_map)).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self._write() as connection:
+            connection.executemany(UPSERT, rows)
+            self._cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            # Перезаписываем только истекшую запись, иначе ничего не меняем.
+            cursor = connection.execute(
+                UPSERT + ' WHERE cache.expires <= ?',
+                (key, self._encode(value),
+                 self.get_backend_timeout(timeout), now, now)
+            )
+            added = cursor.rowcount > 0
+            if added:
+                self._cull(connection, now)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, now)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._encode(value), now, key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now)
+            )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._get_many([key])
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._write() as connection:
+            for start in range(0, len(keys), MAX_VARIABLES):
+                chunk = keys[start:start + MAX_VARIABLES]
+                connection.execute(
+                    f'DELETE FROM cache '
+                    f'WHERE key IN ({",".join("?" * len(chunk))})',
+                    chunk
+                )
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живет весь процесс, как у LocMemCache.
+        pass
+
+
+def relocated(caches, directory):
+    """Копия настройки CACHES, у которой файлы SQLiteCache лежат в
+    directory."""
+    caches = copy.deepcopy(caches)
+    for alias, options in caches.items():
+        if options['BACKEND'] == f'{__name__}.{SQLiteCache.__name__}':
+            options['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+    return caches
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends import SQLiteCache
+
+BATCH = 50
+
+
+def make_cache(name, location):
+    params = {'OPTIONS': {'MAX_ENTRIES': 1_000_000}}
+    if name == 'locmem':
+        return LocMemCache(location, params)
+    return SQLiteCache(os.path.join(location, 'cache.sqlite3'), params)
+
+
+def run_workload(args):
+    """Прогоняет операции в одном процессе и возвращает их длительность."""
+    name, location, worker, ops = args
+    cache = make_cache(name, location)
+    keys = [f'w{worker}:{i}' for i in range(ops)]
+    timings = {}
+
+    started = time.perf_counter()
+    for key in keys:
+        cache.set(key, {'key': key, 'payload': 'x' * 200})
+    timings['set'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    timings['get'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for start in range(0, ops, BATCH):
+        cache.get_many(keys[start:start + BATCH])
+    timings['get_many'] = time.perf_counter() - started
+
+    cache.set('counter', 0)
+    started = time.perf_counter()
+    for _ in range(ops):
+        cache.incr('counter')
+    timings['incr'] = time.perf_counter() - started
+    return timings
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает SQLiteCache с LocMemCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        ops, workers = options['ops'], options['workers']
+        self.stdout.write(
+            f'{"backend":<8} {"op":<9} {"ops/s":>12}   '
+            f'({workers} процессов по {ops} операций)'
+        )
+        for name in ('locmem', 'sqlite'):
+            with tempfile.TemporaryDirectory() as location:
+                with Pool(workers) as pool:
+                    results = pool.map(run_workload, [
+                        (name, location, worker, ops)
+                        for worker in range(workers)
+                    ])
+                # Какая доля записей рабочих процессов видна снаружи.
+                shared = len(make_cache(name, location).get_many(
+                    [f'w0:{i}' for i in range(ops)]
+                )) / ops
+            for op in ('set', 'get', 'get_many', 'incr'):
+                # Процессы работают параллельно, берем самый медленный.
+                elapsed = max(timings[op] for timings in results)
+                self.stdout.write(
+                    f'{name:<8} {op:<9} {ops * workers / elapsed:>12,.0f}'
+                )
+            self.stdout.write(f'{name:<8} {"shared":<9} {shared:>12.0%}')
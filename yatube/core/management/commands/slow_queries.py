@@ -0,0 +1,44 @@
+from textwrap import indent
+
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import ORDERS, slow_query_log
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит самые дорогие медленные запросы, сведенные по отпечатку, '
+        'с их планом, view и местом вызова.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--order', choices=tuple(ORDERS), default='total',
+            help='Суммарное время, число или наибольшее время'
+        )
+        parser.add_argument(
+            '--reset', action='store_true', help='Очистить журнал'
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            slow_query_log.reset()
+            self.stdout.write(self.style.SUCCESS('Журнал очищен'))
+            return
+        rows = slow_query_log.top(options['limit'], options['order'])
+        if not rows:
+            self.stdout.write('Медленных запросов нет')
+            return
+        for (key, statement, plan, view, site,
+             count, total_ms, max_ms) in rows:
+            self.stdout.write(self.style.WARNING(
+                f'[{key}] {count} раз, всего {total_ms:.1f} мс, '
+                f'в среднем {total_ms / count:.1f} мс, '
+                f'наибольшее {max_ms:.1f} мс'
+            ))
+            self.stdout.write(f'  view: {view or "-"}, место: {site}')
+            self.stdout.write(indent(statement, '  '))
+            if plan:
+                self.stdout.write(indent(plan, '    '))
+            self.stdout.write('')
@@ -0,0 +1,40 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик. Для проверки '
+        'чтения с реплик локально; настоящие реплики обновляет СУБД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='replicas',
+            help='Реплика из DATABASE_REPLICAS, по умолчанию все'
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда копирует только базы SQLite')
+        replicas = options['replicas'] or settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError('DATABASE_REPLICAS пуст')
+        for alias in replicas:
+            if alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} нет в DATABASE_REPLICAS')
+            target = connections[alias]
+            target.close()
+            # backup копирует согласованный снимок и не мешает писателям.
+            source = sqlite3.connect(primary.settings_dict['NAME'])
+            destination = sqlite3.connect(target.settings_dict['NAME'])
+            try:
+                source.backup(destination)
+            finally:
+                destination.close()
+                source.close()
+            self.stdout.write(self.style.SUCCESS(f'{alias}: скопирована'))
@@ -0,0 +1,198 @@
+"""Счетчики и гистограммы по страницам, общие для всех процессов.
+
+Каждый WSGI-процесс копит приращения в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд прибавляет их к значениям в общем файле
+SQLite (как у core.cache_backends.SQLiteCache, режим WAL), так что
+запрос почти никогда не пишет в файл. Страница метрик сначала сбрасывает
+приращения своего процесса, а затем отдает сумму из файла в текстовом
+формате Prometheus.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+) WITHOUT ROWID
+'''
+
+ADD = '''
+INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?)
+ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value
+'''
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUESTS = 'yatube_requests_total'
+LATENCY = 'yatube_request_duration_seconds'
+QUERIES = 'yatube_request_queries'
+PAGE_CACHE = 'yatube_page_cache_total'
+RATE_LIMITED = 'yatube_rate_limited_total'
+
+METRICS = {
+    # Имя: тип, описание, границы корзин для гистограмм.
+    REQUESTS: ('counter', 'Ответы по view и коду ответа.', None),
+    LATENCY: ('histogram', 'Время ответа по view.', LATENCY_BUCKETS),
+    QUERIES: ('histogram', 'SQL-запросов на ответ по view.', QUERY_BUCKETS),
+    PAGE_CACHE: ('counter', 'Попадания и промахи кеша страниц.', None),
+    RATE_LIMITED: ('counter', 'Ответы 429 по view.', None),
+}
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._pid = os.getpid()
+        self._flushed = time.monotonic()
+        self._local = threading.local()
+
+    def inc(self, name, amount=1, **labels):
+        self._add(name, format_labels(sorted(labels.items())), amount)
+
+    def observe(self, name, value, **labels):
+        """Значение в гистограмму name: корзина, сумма и количество."""
+        buckets = METRICS[name][2]
+        labels = sorted(labels.items())
+        # Корзины храним без накопления, накапливаем при выводе.
+        index = bisect_left(buckets, value)
+        le = str(buckets[index]) if index < len(buckets) else '+Inf'
+        self._add(f'{name}_bucket', format_labels(labels + [('le', le)]), 1)
+        self._add(f'{name}_sum', format_labels(labels), value)
+        self._add(f'{name}_count', format_labels(labels), 1)
+
+    def _add(self, name, labels, amount):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Приращения родителя достались процессу при fork.
+                self._pending.clear()
+                self._pid = os.getpid()
+            self._pending[name, labels] += amount
+        if time.monotonic() - self._flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def _connection(self):
+        path = settings.METRICS_LOCATION
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.key != (path, os.getpid()):
+            connection = sqlite3.connect(
+                path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+            self._local.key = (path, os.getpid())
+        return connection
+
+    def flush(self):
+        """Прибавляет приращения процесса к значениям в файле.
+
+        Если файл занят или недоступен, приращения остаются до
+        следующего сброса: метрики не должны ронять страницу.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+        try:
+            connection = self._connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(ADD, [
+                    (name, labels, value)
+                    for (name, labels), value in pending.items()
+                ])
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            logger.exception('Не удалось сохранить метрики')
+            with self._lock:
+                self._pending.update(pending)
+
+    def values(self):
+        """{(имя, метки): значение} по всем процессам."""
+        self.flush()
+        return {
+            (name, labels): value
+            for name, labels, value in self._connection().execute(
+                'SELECT name, labels, value FROM metrics')
+        }
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._flushed = time.monotonic()
+        self._connection().execute('DELETE FROM metrics')
+
+
+registry = Registry()
+
+
+def split_le(labels):
+    """Метки без le и граница корзины."""
+    rest, le = labels.rsplit('le="', 1)
+    le = le[:-1]
+    return rest.rstrip(','), float(le)
+
+
+def prometheus_text(values):
+    """Значения в текстовом формате Prometheus."""
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (sample, labels), value in sorted(values.items()):
+                if sample == name:
+                    lines.append(f'{name}{{{labels}}} {value:g}')
+            continue
+        series = {}
+        for (sample, labels), value in values.items():
+            if sample == f'{name}_bucket':
+                rest, le = split_le(labels)
+                series.setdefault(rest, Counter())[le] += value
+        for labels in sorted(series):
+            total = 0
+            prefix = f'{labels},' if labels else ''
+            for le in list(buckets) + [float('inf')]:
+                total += series[labels][le]
+                bound = '+Inf' if le == float('inf') else f'{le:g}'
+                lines.append(
+                    f'{name}_bucket{{{prefix}le="{bound}"}} {total:g}')
+            for suffix in ('sum', 'count'):
+                value = values.get((f'{name}_{suffix}', labels), 0)
+                lines.append(f'{name}_{suffix}{{{labels}}} {value:g}')
+    return '\n'.join(lines) + '\n'
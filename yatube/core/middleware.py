@@ -0,0 +1,128 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from . import timing
+from .metrics import LATENCY, QUERIES, REQUESTS, registry, view_name
+from .routers import replica_reads, wrote
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+logger = logging.getLogger(__name__)
+
+# Порядок и описания метрик в заголовке Server-Timing.
+METRICS = (
+    ('resolve', 'URL resolver'),
+    ('view', 'View'),
+    ('db', 'SQL'),
+    ('template', 'Templates'),
+    ('thumbnail', 'Thumbnails'),
+)
+
+
+class ServerTimingMiddleware:
+    """Время частей ответа в заголовке Server-Timing и в журнале.
+
+    Стоит первой в MIDDLEWARE, поэтому total и db охватывают весь
+    запрос. view считается от process_view до возврата ответа и включает
+    шаблоны, миниатюры и запросы view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        timing.instrument()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with timing.collect() as timings:
+            response = self.get_response(request)
+            view_started = getattr(request, '_timing_view_started', None)
+            if view_started is not None:
+                timings.add(
+                    'view', (time.perf_counter() - view_started) * 1000)
+        timings.add('total', (time.perf_counter() - started) * 1000)
+        response['Server-Timing'] = self.header(timings)
+        logger.info(json.dumps(self.record(request, response, timings)))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_view_started = time.perf_counter()
+        timing.current().view = request.resolver_match.view_name
+
+    @staticmethod
+    def header(timings):
+        metrics = []
+        for name, description in METRICS:
+            if name not in timings.counts:
+                continue
+            if name == 'db':
+                description = f'{timings.counts[name]} queries'
+            metrics.append(
+                f'{name};dur={timings.durations[name]:.1f};'
+                f'desc="{description}"'
+            )
+        metrics.append(f'total;dur={timings.durations["total"]:.1f}')
+        return ', '.join(metrics)
+
+    @staticmethod
+    def record(request, response, timings):
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'event': 'server_timing',
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timings.counts['db'],
+            **{
+                f'{name}_ms': round(duration, 2)
+                for name, duration in timings.durations.items()
+            },
+        }
+
+
+class MetricsMiddleware:
+    """Число ответов, время и SQL-запросы по view в core.metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with timing.collect() as timings:
+            queries = timings.counts['db']
+            response = self.get_response(request)
+            queries = timings.counts['db'] - queries
+        view = view_name(request)
+        registry.inc(REQUESTS, view=view, status=response.status_code)
+        registry.observe(LATENCY, time.perf_counter() - started, view=view)
+        registry.observe(QUERIES, queries, view=view)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Чтение с реплик для безопасных запросов без недавней записи.
+
+    См. core.routers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES
+        with replica_reads(safe and not pinned):
+            response = self.get_response(request)
+            # Пишут и GET-страницы (подписка, отписка), поэтому важен
+            # не метод, а была ли запись.
+            pin = wrote()
+        if pin:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+
 from django.db import models
 
 
@@ -12,3 +14,19 @@ class CreatedModel(models.Model):
     class Meta:
         abstract = True
         ordering = ('-pub_date',)
+
+
+@contextmanager
+def keep_pub_dates(*models):
+    """Отключает auto_now_add у pub_date, чтобы сохранить заданные даты.
+
+    Нужен массовой загрузке данных, в обычном коде не используется.
+    """
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -0,0 +1,123 @@
+import math
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Страница выбирается условием по ключу крайней записи соседней
+    страницы, ключ передается в ссылках непрозрачным токеном.
+    Старые ссылки вида ?page=N обслуживаются обычным Paginator.
+    """
+    KEYS = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page, keys=KEYS):
+        self.keys = keys
+        super().__init__(
+            object_list.order_by(*(f'-{key}' for key in keys)), per_page
+        )
+
+    @staticmethod
+    def format_key(value):
+        return value.isoformat()
+
+    @staticmethod
+    def parse_key(value):
+        return parse_datetime(value)
+
+    def encode_cursor(self, obj):
+        date_key, id_key = self.keys
+        return urlsafe_base64_encode(force_bytes(
+            f'{self.format_key(getattr(obj, date_key))}|{getattr(obj, id_key)}'
+        ))
+
+    def decode_cursor(self, token):
+        try:
+            date, pk = urlsafe_base64_decode(token).decode().split('|')
+            date = self.parse_key(date)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            return None
+        if date is None:
+            return None
+        return date, pk
+
+    def _window(self, cursor, newer):
+        """Записи строго старше (или новее) курсора, с запасом в одну."""
+        date_key, id_key = self.keys
+        date, pk = cursor
+        op = 'gt' if newer else 'lt'
+        queryset = self.object_list.filter(
+            Q(**{f'{date_key}__{op}e': date}),
+            Q(**{f'{date_key}__{op}': date})
+            | Q(**{date_key: date, f'{id_key}__{op}': pk})
+        )
+        if newer:
+            queryset = queryset.reverse()
+        return list(queryset[:self.per_page + 1])
+
+    def get_page(self, number=None, after=None, before=None):
+        if number is not None:
+            page = super().get_page(number)
+            return self._set_cursors(
+                page, page.has_previous(), page.has_next()
+            )
+        before = before and self.decode_cursor(before)
+        after = after and self.decode_cursor(after)
+        if before:
+            items = self._window(before, newer=True)
+            if len(items) > self.per_page:
+                return self._cursor_page(
+                    items[:self.per_page][::-1],
+                    has_previous=True, has_next=True
+                )
+        if after:
+            items = self._window(after, newer=False)
+            return self._cursor_page(
+                items[:self.per_page],
+                has_previous=True, has_next=len(items) > self.per_page
+            )
+        items = list(self.object_list[:self.per_page + 1])
+        return self._cursor_page(
+            items[:self.per_page],
+            has_previous=False, has_next=len(items) > self.per_page
+        )
+
+    def _cursor_page(self, items, has_previous, has_next):
+        # Номер и число страниц описывают окно вокруг текущей страницы,
+        # чтобы методы Page работали без подсчета всех записей.
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        return self._set_cursors(
+            self._get_page(items, number, self), has_previous, has_next
+        )
+
+    def _set_cursors(self, page, has_previous, has_next):
+        items = page.object_list = list(page.object_list)
+        page.previous_cursor = (
+            self.encode_cursor(items[0]) if has_previous and items else None
+        )
+        page.next_cursor = (
+            self.encode_cursor(items[-1]) if has_next and items else None
+        )
+        return page
+
+
+class ScoreCursorPaginator(CursorPaginator):
+    """Курсорный вывод по убыванию числовой оценки, например релевантности.
+
+    keys — имена оценки и уникального ключа записи.
+    """
+    @staticmethod
+    def format_key(value):
+        return repr(float(value))
+
+    @staticmethod
+    def parse_key(value):
+        value = float(value)
+        return value if math.isfinite(value) else None
@@ -0,0 +1,25 @@
+"""Плагин pytest проекта, подключен в conftest.py в корне репозитория.
+
+Переносит файлы кеша и метрик во временный каталог (см. core.testing) и
+проверяет бюджеты запросов страниц в каждом тесте.
+"""
+import pytest
+
+from .query_budget import enforce
+from .testing import isolate_files
+
+
+def pytest_configure(config):
+    isolate_files()
+
+
+@pytest.fixture(autouse=True)
+def query_budgets():
+    """Проваливает тест, если страница превысила бюджет запросов."""
+    with enforce() as violations:
+        yield
+    if violations:
+        pytest.fail(
+            'Превышены бюджеты запросов:\n' + '\n\n'.join(violations),
+            pytrace=False
+        )
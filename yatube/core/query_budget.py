@@ -0,0 +1,175 @@
+"""Бюджеты запросов к базе для страниц.
+
+Декоратор query_budget объявляет у view наибольшее число запросов и
+суммарное время SQL на один ответ. enforce() следит за запросами
+тестового клиента и собирает превышения с текстом запросов,
+сгруппированных по месту вызова: строке шаблона или функции проекта.
+Так N+1 в шаблоне карточки записи виден сразу с номером строки.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from os.path import relpath
+
+from django.conf import settings
+from django.db import connection
+from django.urls import Resolver404, resolve
+
+Budget = namedtuple('Budget', 'queries time_ms')
+Query = namedtuple('Query', 'sql time_ms site')
+
+_state = threading.local()
+
+TEMPLATE_RENDER = 'render_annotated'
+
+# Модули core, оборачивающие запросы: их кадры не место вызова.
+INSTRUMENTATION = ('query_budget.py', 'slow_queries.py', 'timing.py')
+
+# Таблицы, запросы к которым не входят в бюджет. sorl держит ключи
+# миниатюр в кеше и идет в базу только при его промахе, один раз на
+# картинку; тесты же очищают кеш почти перед каждым запросом.
+IGNORED_TABLES = ('thumbnail_kvstore',)
+# Управление транзакциями тоже не считаем: внутри TestCase каждый
+# atomic() дает пару SAVEPOINT/RELEASE, которой вне тестов нет.
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT',
+                       'ROLLBACK TO SAVEPOINT', 'BEGIN')
+
+
+def query_budget(queries, time_ms=None):
+    """Объявляет бюджет запросов view."""
+    def decorator(view):
+        view.query_budget = Budget(queries, time_ms)
+        return view
+    return decorator
+
+
+def budget_for(path):
+    """(имя URL, бюджет или None) для пути."""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None, None
+    return match.view_name, getattr(match.func, 'query_budget', None)
+
+
+def is_project_code(filename):
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and not (os.path.dirname(filename) == os.path.dirname(__file__)
+                 and os.path.basename(filename) in INSTRUMENTATION)
+        and f'{os.sep}tests{os.sep}' not in filename
+        and not filename.endswith('tests.py')
+    )
+
+
+def call_site():
+    """Ближайшие к запросу строка шаблона или код проекта.
+
+    Если запрос сделан не из проекта (например, сессию читает
+    middleware), называется ближайший модуль за пределами django.db.
+    """
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '')
+        if code.co_name == TEMPLATE_RENDER:
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        elif is_project_code(code.co_filename):
+            return (f'{relpath(code.co_filename, settings.BASE_DIR)}:'
+                    f'{frame.f_lineno} in {code.co_name}')
+        elif fallback is None and not module.startswith('django.db'):
+            fallback = f'{module}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return fallback or '?'
+
+
+class QueryLog:
+    """Обертка execute, запоминающая запросы с местом вызова."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if (sql.startswith(TRANSACTION_CONTROL)
+                or any(f'"{table}"' in sql for table in IGNORED_TABLES)):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(Query(
+                sql, (time.perf_counter() - started) * 1000, call_site()
+            ))
+
+
+def report(path, name, budget, queries):
+    """Текст превышения бюджета или None; бюджет без time_ms
+    проверяет только число запросов."""
+    total_ms = sum(query.time_ms for query in queries)
+    problems = []
+    if len(queries) > budget.queries:
+        problems.append(
+            f'{len(queries)} запросов при бюджете {budget.queries}')
+    if budget.time_ms is not None and total_ms > budget.time_ms:
+        problems.append(
+            f'{total_ms:.1f} мс SQL при бюджете {budget.time_ms} мс')
+    if not problems:
+        return None
+    lines = [f'{path} ({name}): ' + ', '.join(problems)]
+    sites = Counter(query.site for query in queries)
+    for site, count in sites.most_common():
+        lines.append(f'  {count}x {site}')
+        statements = Counter(
+            query.sql for query in queries if query.site == site)
+        for sql, repeated in statements.most_common():
+            lines.append(f'      [{repeated}] {sql}')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def enforce(check_time=False):
+    """Проверяет бюджеты ответов тестового клиента внутри блока.
+
+    Возвращает список текстов превышений, он пополняется по ходу.
+    Время SQL зависит от машины, поэтому по умолчанию проверяется
+    только число запросов; check_time=True добавляет и time_ms.
+    """
+    from django.test import Client
+
+    violations = []
+    original = Client.request
+
+    def request(client, **environ):
+        # Во вложенном enforce запрос проверяет только внутренний.
+        if getattr(_state, 'checking', False):
+            return original(client, **environ)
+        log = QueryLog()
+        _state.checking = True
+        try:
+            with connection.execute_wrapper(log):
+                response = original(client, **environ)
+        finally:
+            _state.checking = False
+        path = environ.get('PATH_INFO', '/')
+        name, budget = budget_for(path)
+        if budget is not None:
+            if not check_time:
+                budget = budget._replace(time_ms=None)
+            violation = report(path, name, budget, log.queries)
+            if violation:
+                violations.append(violation)
+        return response
+
+    Client.request = request
+    try:
+        yield violations
+    finally:
+        Client.request = original
@@ -0,0 +1,103 @@
+"""Ограничение частоты запросов к view по пользователю и адресу.
+
+Декоратор rate_limit объявляет у view лимиты вида '20/m': не больше 20
+запросов в минуту от одного пользователя (user) и с одного адреса (ip).
+Сверх лимита view не вызывается, и запрос не трогает базу: в ответ
+идет 429 с заголовком Retry-After.
+
+Счет ведется скользящим окном в кеше. Запросы текущего окна считает
+cache.incr, а запросы прошлого окна входят в оценку с весом, который
+убывает до нуля к концу текущего окна. add и incr атомарны во всех
+бэкендах кеша, поэтому счетчик общий для всех процессов. Отклоненные
+запросы тоже считаются: тот, кто продолжает долбить страницу, остается
+заблокированным.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+from .metrics import RATE_LIMITED, registry, view_name
+
+KEY = 'ratelimit:{}:{}:{}:{}'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'20/m' -> (20, 60): число запросов и окно в секундах."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def hit(scope, ident, limit, window, now=None):
+    """Учитывает запрос; возвращает, через сколько секунд повторить,
+    или 0, если лимит не превышен."""
+    now = time.time() if now is None else now
+    number, elapsed = divmod(now, window)
+    key = KEY.format(scope, ident, window, int(number))
+    cache.add(key, 0, window * 2)
+    try:
+        current = cache.incr(key)
+    except ValueError:
+        # Ключ вытеснили между add и incr.
+        cache.set(key, 1, window * 2)
+        current = 1
+    previous = cache.get(KEY.format(scope, ident, window, int(number) - 1), 0)
+    weight = 1 - elapsed / window
+    if previous * weight + current <= limit:
+        return 0
+    if current < limit:
+        # Хватит, когда вес прошлого окна упадет достаточно.
+        wait = window * (1 - (limit - current) / previous) - elapsed
+    else:
+        # Ждем следующего окна, пока вес текущего не упадет.
+        wait = window - elapsed + window * (1 - (limit - 1) / current)
+    return max(1, math.ceil(round(wait, 3)))
+
+
+def rate_limit(user=None, ip=None, methods=None):
+    """Объявляет лимиты view: user — на пользователя, ip — на адрес.
+
+    methods ограничивает проверку методами запроса, по умолчанию все.
+    """
+    limits = [
+        (kind, *parse_rate(rate))
+        for kind, rate in (('user', user), ('ip', ip)) if rate
+    ]
+
+    def decorator(view):
+        scope = f'{view.__module__}.{view.__qualname__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.RATE_LIMIT_ENABLED
+                    or methods and request.method not in methods):
+                return view(request, *args, **kwargs)
+            retry_after = 0
+            for kind, limit, window in limits:
+                if kind == 'user':
+                    if not request.user.is_authenticated:
+                        continue
+                    ident = request.user.pk
+                else:
+                    ident = client_ip(request)
+                retry_after = max(retry_after, hit(
+                    scope, f'{kind}:{ident}', limit, window))
+            if not retry_after:
+                return view(request, *args, **kwargs)
+            registry.inc(RATE_LIMITED, view=view_name(request))
+            response = render(
+                request, 'core/429.html',
+                {'retry_after': retry_after}, status=429
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+        return wrapper
+    return decorator
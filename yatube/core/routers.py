@@ -0,0 +1,79 @@
+"""Чтение с реплик базы, запись в основную.
+
+ReplicaRouter отправляет чтение на одну из DATABASE_REPLICAS только
+внутри replica_reads(True): его включает ReplicaPinMiddleware для
+безопасных запросов (GET, HEAD), после которых не было недавней записи.
+Остальное — формы, команды, сигналы вне запроса — читает основную базу.
+Запись всегда идет в основную базу, даже для объекта, прочитанного с
+реплики. После первой записи запрос дочитывает с основной базы, а ответ
+на запрос, который что-то записал (в том числе GET вроде подписки),
+ставит cookie, и REPLICA_PIN_SECONDS секунд чтение этого посетителя
+тоже идет с основной базы: он видит свою запись или комментарий, даже
+если реплика отстает.
+
+Сессии всегда читаются с основной базы: иначе после входа отстающая
+реплика вернула бы посетителя в анонимы.
+
+Страница, собранная по отстающей реплике, может попасть в кеш страниц
+с уже новой версией и прожить в нем до PAGE_CACHE_SOFT_TTL; отставание
+реплики должно быть заметно меньше этого срока.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+# Приложения, модели которых всегда читаются с основной базы.
+PRIMARY_APPS = ('sessions',)
+
+
+@contextmanager
+def replica_reads(allowed):
+    """Разрешает или запрещает чтение с реплик внутри блока."""
+    previous = getattr(_state, 'replicas', False)
+    written = getattr(_state, 'wrote', False)
+    _state.replicas = allowed
+    _state.wrote = False
+    try:
+        yield
+    finally:
+        _state.replicas = previous
+        _state.wrote = written or _state.wrote
+
+
+def reading_replicas():
+    return getattr(_state, 'replicas', False)
+
+
+def wrote():
+    """Была ли запись внутри текущего блока replica_reads."""
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or not reading_replicas()
+                or model._meta.app_label in PRIMARY_APPS):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # После записи запрос читает свои изменения с основной базы.
+        # None отправил бы объект, прочитанный с реплики, обратно в нее.
+        _state.replicas = False
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики хранят копию основной базы, связи между ними законны.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,186 @@
+"""Журнал медленных SQL-запросов с планом выполнения.
+
+Обертка execute ставится на каждое соединение с базой (сигнал
+connection_created) и замеряет каждый запрос. Запрос дольше
+SLOW_QUERY_MS пишется в журнал core.slow_queries вместе с планом
+(EXPLAIN QUERY PLAN на SQLite), view и местом вызова в коде проекта.
+Запросы, отличающиеся только значениями, сводятся к одному отпечатку:
+план для него строится один раз на процесс, а число, суммарное и
+наибольшее время копятся в общем файле SLOW_QUERY_LOCATION, откуда их
+читает команда slow_queries.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+from . import timing
+from .query_budget import call_site
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS slow_queries (
+    fingerprint TEXT PRIMARY KEY,
+    statement TEXT NOT NULL,
+    plan TEXT,
+    view TEXT,
+    site TEXT,
+    count INTEGER NOT NULL,
+    total_ms REAL NOT NULL,
+    max_ms REAL NOT NULL,
+    last_seen REAL NOT NULL
+) WITHOUT ROWID
+'''
+
+RECORD = '''
+INSERT INTO slow_queries VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?)
+ON CONFLICT (fingerprint) DO UPDATE SET
+    plan = COALESCE(excluded.plan, plan),
+    view = excluded.view,
+    site = excluded.site,
+    count = count + 1,
+    total_ms = total_ms + excluded.total_ms,
+    max_ms = MAX(max_ms, excluded.max_ms),
+    last_seen = excluded.last_seen
+'''
+
+ORDERS = {
+    'total': 'total_ms DESC',
+    'count': 'count DESC',
+    'max': 'max_ms DESC',
+}
+
+# Сколько планов помнить в процессе.
+PLAN_CACHE_SIZE = 1000
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize(sql):
+    """Текст запроса без значений: литералы и списки IN заменены."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """План запроса SELECT или None.
+
+    Курсор берется у драйвера напрямую, чтобы EXPLAIN не прошел через
+    обертки execute и не попал в замеры запроса.
+    """
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{prefix} {sql}', params)
+        rows = cursor.fetchall()
+    except Exception as error:
+        return f'EXPLAIN не удался: {error}'
+    finally:
+        cursor.close()
+    if connection.vendor != 'sqlite':
+        return '\n'.join(' '.join(map(str, row)) for row in rows)
+    # Строки SQLite: (id, parent, notused, detail); отступ по глубине.
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return '\n'.join(lines)
+
+
+class SlowQueryLog:
+    """Обертка execute, замечающая запросы дольше SLOW_QUERY_MS."""
+
+    def __init__(self):
+        self._plans = {}
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold = settings.SLOW_QUERY_MS
+        if threshold is None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= threshold:
+                self.record(sql, None if many else params, duration_ms,
+                            context['connection'])
+
+    def record(self, sql, params, duration_ms, connection):
+        key = fingerprint(sql)
+        plan = self._plans.get(key)
+        if key not in self._plans and params is not None:
+            plan = explain(connection, sql, params)
+            if len(self._plans) >= PLAN_CACHE_SIZE:
+                self._plans.clear()
+            self._plans[key] = plan
+        timings = timing.current()
+        view = getattr(timings, 'view', None)
+        site = call_site()
+        logger.warning(
+            'Медленный запрос %.1f мс [%s] view=%s site=%s\n%s\n%s',
+            duration_ms, key, view, site, sql, plan or '',
+        )
+        try:
+            self._connection().execute(RECORD, (
+                key, normalize(sql), plan, view, site,
+                duration_ms, duration_ms, time.time(),
+            ))
+        except sqlite3.Error:
+            logger.exception('Не удалось сохранить медленный запрос')
+
+    def _connection(self):
+        path = settings.SLOW_QUERY_LOCATION
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.key != (path, os.getpid()):
+            connection = sqlite3.connect(
+                path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+            self._local.key = (path, os.getpid())
+        return connection
+
+    def top(self, limit=10, order='total'):
+        """Самые дорогие отпечатки: строки таблицы slow_queries."""
+        cursor = self._connection().execute(
+            f'SELECT fingerprint, statement, plan, view, site, count, '
+            f'total_ms, max_ms FROM slow_queries ORDER BY {ORDERS[order]} '
+            f'LIMIT ?', (limit,)
+        )
+        return cursor.fetchall()
+
+    def reset(self):
+        self._plans.clear()
+        self._connection().execute('DELETE FROM slow_queries')
+
+
+slow_query_log = SlowQueryLog()
+
+
+def install(sender, connection, **kwargs):
+    """Ставит обертку на соединение (приемник connection_created)."""
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
@@ -0,0 +1,28 @@
+"""Настройка соединений SQLite.
+
+У каждого нового соединения приемник configure выполняет PRAGMA из
+settings.SQLITE_PRAGMAS: журнал WAL (читатели не ждут писателя),
+synchronous=NORMAL (в WAL не теряет целостности при сбое процесса),
+отображение файла в память, размер кеша страниц и время ожидания
+блокировки. Вместе с CONN_MAX_AGE соединение и его настройки живут
+между запросами, а не создаются заново на каждом.
+"""
+from django.conf import settings
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3."""
+    for statement in pragma_statements(pragmas):
+        connection.execute(statement)
+
+
+def configure(sender, connection, **kwargs):
+    """Приемник connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую у драйвера: настройка соединения не запрос страницы.
+    apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
@@ -0,0 +1,40 @@
+"""Окружение тестов.
+
+Кеш, метрики и журнал медленных запросов живут в файлах SQLite рядом с
+проектом и общие с запущенным сайтом. Тесты переносят их во временный
+каталог на время прогона: cache.clear() не трогает кеш сайта, а
+бессрочные записи вроде posts:author:{id} не переживают прогон, после
+которого id тестовой базы начинаются заново.
+
+Для manage.py test это делает TestRunner (TEST_RUNNER), для pytest —
+плагин core.pytest_plugin.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .cache_backends import relocated
+
+
+def isolate_files():
+    """Переносит файлы кеша, метрик и медленных запросов во временный
+    каталог, удаляемый при выходе."""
+    directory = tempfile.mkdtemp(prefix='yatube-tests-')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    # setting_changed для CACHES сбрасывает уже созданные бэкенды.
+    override_settings(
+        CACHES=relocated(settings.CACHES, directory),
+        METRICS_LOCATION=os.path.join(directory, 'metrics.sqlite3'),
+        SLOW_QUERY_LOCATION=os.path.join(directory, 'slow_queries.sqlite3'),
+    ).enable()
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        isolate_files()
@@ -1,4 +1,48 @@
-from django.test import TestCase
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.contrib.sessions.models import Session
+from django.db import DatabaseError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.auth import USER_KEY, CachedModelBackend
+from core.batching import Batch
+from core.cache_backends import SQLiteCache
+from core.metrics import registry
+from core.ratelimit import hit
+from core.routers import ReplicaRouter, replica_reads
+from core.slow_queries import fingerprint, slow_query_log
+from core.timing import Timings
+from posts.models import Comment, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+INDEX_URL = reverse('posts:index')
+METRICS_URL = reverse('core:metrics')
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+METRIC = re.compile(r'(\w+);dur=[\d.]+(?:;desc="([^"]*)")?')
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +50,499 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TestFilesTests(TestCase):
+    def test_files_are_temporary(self):
+        """Тесты не трогают кеш, метрики и журнал запросов сайта."""
+        for path in (settings.CACHES['default']['LOCATION'],
+                     settings.METRICS_LOCATION,
+                     settings.SLOW_QUERY_LOCATION):
+            with self.subTest(path=path):
+                self.assertNotEqual(
+                    os.path.dirname(path), str(settings.BASE_DIR))
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.cache = SQLiteCache(
+            os.path.join(self.location, 'cache.sqlite3'),
+            {'OPTIONS': {'MAX_ENTRIES': 10}}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def test_set_get_many(self):
+        """set_many и get_many возвращают сохраненные значения."""
+        self.cache.set_many({'a': 1, 'b': {'text': 'b'}})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']),
+            {'a': 1, 'b': {'text': 'b'}}
+        )
+
+    def test_add_and_incr(self):
+        """add не перезаписывает живую запись, incr атомарно меняет число."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 10))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_entry(self):
+        """Истекшая запись не читается и может быть добавлена заново."""
+        self.cache.set('key', 'old', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        self.cache.ACCESS_RESOLUTION = 0
+        self.cache.set('hot', 'value')
+        for i in range(20):
+            self.cache.get('hot')
+            self.cache.set(f'key_{i}', i)
+        self.assertEqual(self.cache.get('hot'), 'value')
+        self.assertIsNone(self.cache.get('key_0'))
+        self.assertLessEqual(
+            len(self.cache.get_many([f'key_{i}' for i in range(20)])), 10
+        )
+
+    def test_shared_between_instances(self):
+        """Записи видны другому экземпляру с тем же файлом."""
+        self.cache.set('key', 'value')
+        other = SQLiteCache(
+            os.path.join(self.location, 'cache.sqlite3'), {}
+        )
+        self.assertEqual(other.get('key'), 'value')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author')
+        cls.post = Post.objects.create(
+            author=author,
+            text='Тестовый текст',
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=[cls.post.pk])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def metrics(self, response):
+        return dict(METRIC.findall(response['Server-Timing']))
+
+    def test_header_lists_parts_of_request(self):
+        """В заголовке есть разбор URL, view, SQL, шаблоны и миниатюры."""
+        metrics = self.metrics(self.client.get(self.POST_DETAIL_URL))
+        for name in ('resolve', 'view', 'db', 'template', 'thumbnail',
+                     'total'):
+            with self.subTest(name=name):
+                self.assertIn(name, metrics)
+        self.assertRegex(metrics['db'], r'^[1-9]\d* queries$')
+
+    def test_log_line(self):
+        """Те же замеры пишутся в журнал одной строкой JSON."""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.client.get(INDEX_URL)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['path'], INDEX_URL)
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['view_ms'])
+
+    def test_not_found(self):
+        """Ответ без view тоже получает заголовок."""
+        response = self.client.get('/nonexist-page/')
+        self.assertIn('total', self.metrics(response))
+        self.assertNotIn('view', self.metrics(response))
+
+
+class TimingsTests(TestCase):
+    def test_nested_measure_counted_once(self):
+        """Вложенный замер того же вида не удваивает время."""
+        timings = Timings()
+        with timings.measure('template'):
+            with timings.measure('template'):
+                pass
+        self.assertEqual(timings.counts['template'], 1)
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.location = tempfile.mkdtemp()
+        cls.override = override_settings(METRICS_LOCATION=os.path.join(
+            cls.location, 'metrics.sqlite3'))
+        cls.override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.override.disable()
+        shutil.rmtree(cls.location, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        cls.user = User.objects.create(username='user')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_staff_only(self):
+        """Метрики видит только персонал."""
+        self.client.force_login(self.user)
+        self.assertRedirects(
+            self.client.get(METRICS_URL),
+            f'{reverse("admin:login")}?next={METRICS_URL}'
+        )
+        self.client.force_login(self.staff)
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    def test_requests_latency_and_cache(self):
+        """Ответы, корзины времени и кеш страниц считаются по view."""
+        self.client.get(INDEX_URL)
+        self.client.get(INDEX_URL)
+        self.client.force_login(self.staff)
+        text = self.client.get(METRICS_URL).content.decode()
+        for line in (
+            'yatube_requests_total{status="200",view="posts:index"} 2',
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            'yatube_request_queries_count{view="posts:index"} 2',
+            'yatube_page_cache_total{result="hit",view="posts:index"} 1',
+            'yatube_page_cache_total{result="miss",view="posts:index"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, text.splitlines())
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы выводятся с накоплением."""
+        registry.observe('yatube_request_queries', 2, view='v')
+        registry.observe('yatube_request_queries', 7, view='v')
+        self.client.force_login(self.staff)
+        lines = self.client.get(METRICS_URL).content.decode().splitlines()
+        for le, count in (('1', 0), ('2', 1), ('5', 1), ('10', 2),
+                          ('+Inf', 2)):
+            with self.subTest(le=le):
+                self.assertIn(
+                    f'yatube_request_queries_bucket{{view="v",le="{le}"}} '
+                    f'{count}', lines)
+        self.assertIn('yatube_request_queries_sum{view="v"} 9', lines)
+
+    def test_failed_flush_keeps_counts(self):
+        """Занятый файл метрик не роняет запрос и не теряет счета."""
+        # Иначе inc сам сбросит счета, если с прошлого сброса прошла
+        # секунда.
+        with override_settings(METRICS_FLUSH_INTERVAL=60), mock.patch.object(
+                registry, '_connection',
+                side_effect=sqlite3.OperationalError('database is locked')):
+            registry.inc('yatube_requests_total', view='v', status=200)
+            with self.assertLogs('core.metrics', 'ERROR'):
+                registry.flush()
+        self.assertEqual(registry.values()[
+            'yatube_requests_total', 'status="200",view="v"'], 1)
+
+
+class SlowQueryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.location = tempfile.mkdtemp()
+        cls.override = override_settings(
+            SLOW_QUERY_MS=0,
+            SLOW_QUERY_LOCATION=os.path.join(
+                cls.location, 'slow_queries.sqlite3'),
+        )
+        cls.override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.override.disable()
+        shutil.rmtree(cls.location, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        slow_query_log.reset()
+
+    def test_fingerprint_ignores_values(self):
+        """Запросы, различающиеся значениями, дают один отпечаток."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 'x' AND b IN (1, 2) "
+                        "LIMIT 10"),
+            fingerprint("SELECT * FROM t WHERE a = 'y''z' AND b IN (3) "
+                        "LIMIT 20"),
+        )
+        self.assertNotEqual(
+            fingerprint('SELECT * FROM t WHERE a = %s'),
+            fingerprint('SELECT * FROM t WHERE b = %s'),
+        )
+
+    def test_logged_with_plan_view_and_site(self):
+        """Запрос пишется в журнал с планом, view и местом вызова."""
+        with self.assertLogs('core.slow_queries', 'WARNING'):
+            self.client.get(INDEX_URL)
+            cache.clear()
+            self.client.get(INDEX_URL)
+        rows = slow_query_log.top(limit=100, order='count')
+        posts = [
+            row for row in rows
+            if row[3] == 'posts:index' and 'LIMIT' in row[1]
+        ]
+        self.assertTrue(posts)
+        key, statement, plan, view, site, count, total, largest = posts[0]
+        self.assertRegex(plan, r'SCAN|SEARCH')
+        self.assertNotRegex(site, r'slow_queries|timing')
+        self.assertEqual(count, 2)
+
+    def test_command_prints_top(self):
+        """Команда выводит отпечатки с планом и обнуляет журнал."""
+        self.client.get(INDEX_URL)
+        key = slow_query_log.top(limit=1)[0][0]
+        out = StringIO()
+        call_command('slow_queries', '--limit', '3', stdout=out)
+        self.assertIn(f'[{key}]', out.getvalue())
+        call_command('slow_queries', '--reset', stdout=out)
+        self.assertEqual(slow_query_log.top(), [])
+
+
+class SQLitePragmaTests(TestCase):
+    def test_pragmas_applied(self):
+        """Соединение получает PRAGMA из настроек."""
+        # mmap_size и журнал у тестовой базы в памяти не применяются.
+        with connection.cursor() as cursor:
+            for name in ('synchronous', 'cache_size', 'busy_timeout'):
+                with self.subTest(pragma=name):
+                    cursor.execute(f'PRAGMA {name}')
+                    value, = cursor.fetchone()
+                    expected = settings.SQLITE_PRAGMAS[name]
+                    if name == 'synchronous':
+                        # NORMAL возвращается числом.
+                        expected = 1
+                    self.assertEqual(value, expected)
+
+
+@override_settings(BATCH_INTERVAL=60)
+class BatchTests(TransactionTestCase):
+    # Вне транзакции TestCase on_commit срабатывает сразу и взводит таймер.
+
+    def setUp(self):
+        self.saved = []
+        self.batch = Batch(
+            'test', self.saved.append, lambda a, b: (a or 0) + b,
+            'BATCH_INTERVAL'
+        )
+
+    def tearDown(self):
+        if self.batch._timer is not None:
+            self.batch._timer.cancel()
+
+    def add(self, key):
+        self.batch.update(key, lambda value: (value or 0) + 1)
+
+    def test_failed_save_keeps_values(self):
+        """Пачка, которую не удалось сохранить, уходит со следующей."""
+        self.add('a')
+        with mock.patch.object(self.batch, 'save',
+                               side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.batch.flush()
+        self.add('a')
+        self.add('b')
+        self.batch.flush()
+        self.assertEqual(self.saved, [{'a': 2, 'b': 1}])
+
+    @override_settings(BATCH_INTERVAL=0.01)
+    def test_timer_flushes_idle_process(self):
+        """Пачка сохраняется по таймеру без новых событий."""
+        self.add('a')
+        deadline = time.monotonic() + 2
+        while not self.saved and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.saved, [{'a': 1}])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TransactionTestCase):
+    # Реплика в тестах — зеркало тестовой базы (TEST MIRROR), поэтому
+    # данные нужны зафиксированные, а не в транзакции TestCase.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reader')
+        self.post = Post.objects.create(author=self.user, text='Текст')
+        self.client.force_login(self.user)
+        self.router = ReplicaRouter()
+
+    def replica_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = getattr(self.client, method)(url, data)
+        return response, len(queries)
+
+    def test_router_outside_requests_reads_primary(self):
+        """Вне запроса, после записи и для сессий читается основная."""
+        self.assertIsNone(self.router.db_for_read(Post))
+        with replica_reads(True):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertIsNone(self.router.db_for_read(Session))
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertIsNone(self.router.db_for_read(Post))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def test_safe_request_reads_replica(self):
+        """Страница записи читается с реплики."""
+        response, queries = self.replica_queries('get', reverse(
+            'posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(queries, 0)
+
+    def test_pinned_after_write(self):
+        """После комментария посетитель какое-то время читает основную."""
+        response, _ = self.replica_queries('post', reverse(
+            'posts:add_comment', args=[self.post.pk]), {'text': 'Мой'})
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertTrue(Comment.objects.filter(text='Мой').exists())
+        _, queries = self.replica_queries('get', reverse(
+            'posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(queries, 0)
+
+    def test_pinned_after_get_write(self):
+        """Подписка по GET тоже закрепляет чтение за основной базой,
+        а чтение без записи — нет."""
+        response = self.client.get(reverse(
+            'posts:post_detail', args=[self.post.pk]))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        author = User.objects.create(username='author')
+        response = self.client.get(reverse(
+            'posts:profile_follow', args=[author.username]))
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_replica_object_saved_to_primary(self):
+        """Объект, прочитанный с реплики, сохраняется в основную."""
+        post = Post.objects.using('replica').get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(post._state.db, 'default')
+
+    def test_cached_user_from_primary(self):
+        """Пользователь для кеша читается с основной базы."""
+        with replica_reads(True), CaptureQueriesContext(
+                connections['replica']) as queries:
+            user = CachedModelBackend().get_user(self.user.pk)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(user._state.db, 'default')
+        cached = cache.get(USER_KEY.format(self.user.pk))
+        self.assertEqual(cached._state.db, 'default')
+
+
+class CachedAuthTests(TestCase):
+    PASSWORD = 'Old-password-1'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password=cls.PASSWORD)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='reader', password=self.PASSWORD)
+        self.key = USER_KEY.format(self.user.pk)
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in queries
+            if 'FROM "django_session"' in query['sql']
+            or 'FROM "auth_user"' in query['sql']
+        ]
+
+    def test_authenticated_page_without_auth_queries(self):
+        """Сессия и пользователь берутся из кеша без запросов к базе."""
+        self.auth_queries(FOLLOW_INDEX_URL)
+        response, queries = self.auth_queries(FOLLOW_INDEX_URL)
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual(queries, [])
+
+    def test_password_change_forgets_user(self):
+        """Смена пароля сбрасывает кеш, сессия остается рабочей."""
+        self.client.get(FOLLOW_INDEX_URL)
+        self.assertIsNotNone(cache.get(self.key))
+        new_password = 'New-password-2'
+        self.client.post(reverse('users:password_change'), {
+            'old_password': self.PASSWORD,
+            'new_password1': new_password,
+            'new_password2': new_password,
+        })
+        self.assertIsNone(cache.get(self.key))
+        response = self.client.get(FOLLOW_INDEX_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(cache.get(self.key).check_password(new_password))
+
+    def test_logout_forgets_user(self):
+        """После выхода пользователя нет в кеше, страница требует входа."""
+        self.client.get(FOLLOW_INDEX_URL)
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(self.key))
+        self.assertEqual(self.client.get(FOLLOW_INDEX_URL).status_code, 302)
+
+
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.bot = User.objects.create(username='bot')
+        cls.post = Post.objects.create(author=cls.author, text='Запись')
+        cls.ADD_COMMENT_URL = reverse(
+            'posts:add_comment', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sliding_window(self):
+        """Прошлое окно учитывается с убывающим весом."""
+        self.assertEqual(hit('scope', 'ident', 2, 60, now=600), 0)
+        self.assertEqual(hit('scope', 'ident', 2, 60, now=610), 0)
+        # Следующее окно начнется через 50 с, и еще 40 с ждем, пока
+        # вес трех запросов этого окна не упадет до одного.
+        self.assertEqual(hit('scope', 'ident', 2, 60, now=610), 90)
+        # В середине следующего окна три прошлых запроса весят 1.5.
+        self.assertEqual(hit('scope', 'ident', 2, 60, now=690), 10)
+        self.assertEqual(hit('scope', 'other', 2, 60, now=690), 0)
+
+    def test_view_limited_before_database(self):
+        """Сверх лимита view отвечает 429 с Retry-After без запросов."""
+        client = self.client
+        client.force_login(self.bot)
+        for _ in range(10):
+            client.post(self.ADD_COMMENT_URL, {'text': 'Спам'})
+        with self.assertNumQueries(0):
+            response = client.post(self.ADD_COMMENT_URL, {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Comment.objects.count(), 10)
+        client.force_login(self.author)
+        response = client.post(self.ADD_COMMENT_URL, {'text': 'Ответ'})
+        self.assertEqual(response.status_code, 302)
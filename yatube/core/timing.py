@@ -0,0 +1,111 @@
+"""Замеры частей обработки запроса для заголовка Server-Timing.
+
+collect() заводит для текущего потока набор замеров, а instrument()
+один раз оборачивает разбор URL, отрисовку шаблонов и тег
+{% thumbnail %} так, что внутри collect() их время копится в этом
+наборе. Вложенные вызовы одного вида (include внутри шаблона, include()
+в urls.py) не считаются второй раз. Вне collect() обертки только
+проверяют thread-local и зовут исходный метод.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+_local = threading.local()
+_lock = threading.Lock()
+_instrumented = False
+
+
+class Timings:
+    """Суммарное время (мс) и число вызовов по видам работы."""
+
+    def __init__(self):
+        self.durations = Counter()
+        self.counts = Counter()
+        self.depth = Counter()
+        # Имя view, когда оно уже известно.
+        self.view = None
+
+    @contextmanager
+    def measure(self, name):
+        if self.depth[name]:
+            yield
+            return
+        self.depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth[name] -= 1
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name, duration_ms):
+        self.durations[name] += duration_ms
+        self.counts[name] += 1
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка execute: время и число SQL-запросов."""
+        with self.measure('db'):
+            return execute(sql, params, many, context)
+
+
+def current():
+    """Замеры текущего запроса или None."""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def collect():
+    """Копит замеры потока внутри блока, в том числе SQL всех баз.
+
+    Вложенный collect() продолжает замеры внешнего.
+    """
+    from django.db import connections
+
+    if current() is not None:
+        yield current()
+        return
+    timings = Timings()
+    _local.timings = timings
+    wrappers = [
+        connection.execute_wrapper(timings) for connection in connections.all()
+    ]
+    try:
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        yield timings
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+        _local.timings = None
+
+
+def measured(name, method):
+    """Метод, время которого внутри collect() идет в замер name."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        timings = current()
+        if timings is None:
+            return method(*args, **kwargs)
+        with timings.measure(name):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def instrument():
+    """Оборачивает разбор URL, шаблоны и тег миниатюр; один раз."""
+    global _instrumented
+    from django.template.base import Template
+    from django.urls.resolvers import URLResolver
+    from sorl.thumbnail.templatetags.thumbnail import ThumbnailNodeBase
+
+    with _lock:
+        if _instrumented:
+            return
+        URLResolver.resolve = measured('resolve', URLResolver.resolve)
+        Template.render = measured('template', Template.render)
+        ThumbnailNodeBase.render = measured(
+            'thumbnail', ThumbnailNodeBase.render)
+        _instrumented = True
@@ -1,10 +1,41 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
+from .export import KINDS, gzip_chunks, lines, rows
 from .models import Comment, Follow, Group, Post
+from .search import to_match
+
+
+def export_jsonl(modeladmin, request, queryset):
+    """Отдает выбранные строки сжатым JSONL, не собирая файл в памяти."""
+    kind = KINDS[queryset.model]
+    response = StreamingHttpResponse(
+        gzip_chunks(lines(kind, 'jsonl', rows(kind, queryset))),
+        content_type='application/gzip'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.jsonl.gz"'
+    )
+    return response
+
+
+export_jsonl.short_description = 'Выгрузить выбранные в JSONL'
+
+
+class FullTextSearchMixin:
+    """Поиск в админке по FTS5-индексу текста вместо LIKE по таблице."""
+
+    def get_search_results(self, request, queryset, search_term):
+        match = to_match(search_term)
+        if not match:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(search_index__text__match=match), False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -16,6 +47,7 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = (export_jsonl,)
 
 
 @admin.register(Group)
@@ -28,13 +60,15 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('slug',)
     list_filter = ('title',)
     empty_value_display = '-пусто-'
+    actions = (export_jsonl,)
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'text', 'pub_date')
     list_filter = ('text', 'pub_date')
-    search_fields = ('post', 'author', 'text')
+    search_fields = ('text',)
+    actions = (export_jsonl,)
 
 
 @admin.register(Follow)
@@ -42,3 +76,4 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
     list_filter = ('user', 'author')
     search_fields = ('user', 'author')
+    actions = (export_jsonl,)
@@ -0,0 +1,191 @@
+"""Просмотры записей без записи в базу на каждый просмотр.
+
+UPDATE на каждый показ страницы выстроил бы всех писателей SQLite в
+очередь. Поэтому процесс копит просмотры в памяти по (запись, день), а
+раз в ANALYTICS_FLUSH_INTERVAL секунд фоновый поток (core.batching)
+сохраняет их в PostViews одной пачкой.
+
+Уникальных посетителей оценивает HyperLogLog: 2 ** PRECISION регистров
+по байту, погрешность около 1.04 / sqrt(2 ** PRECISION) — 3% для 1024
+регистров. Оценки объединяются поразрядным максимумом, так что счетчики
+разных процессов и дней складываются без потери точности. Строки дня
+читаются с блокировкой, а строку, которую между чтением и вставкой
+создал другой процесс, сохранение перечитывает и обновляет, так что
+одновременные сохранения не теряют ни просмотров, ни регистров.
+"""
+import hashlib
+import math
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from core.batching import Batch
+
+from .models import Post, PostViews
+
+PRECISION = 10
+REGISTERS = 2 ** PRECISION
+
+
+class HyperLogLog:
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers or REGISTERS)
+
+    def add(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - PRECISION)
+        rest = hashed & ((1 << (64 - PRECISION)) - 1)
+        # Номер первой единицы в оставшихся битах.
+        rank = 64 - PRECISION - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other))
+
+    def __len__(self):
+        alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+        estimate = alpha * REGISTERS ** 2 / sum(
+            2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Для малых чисел точнее подсчет пустых регистров.
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+
+def visitor(request):
+    """Метка посетителя: пользователь, сессия или адрес с браузером."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key:
+        return f'session:{request.session.session_key}'
+    return 'anonymous:{}:{}'.format(
+        request.META.get('REMOTE_ADDR', ''),
+        request.META.get('HTTP_USER_AGENT', '')
+    )
+
+
+def record(post_id, visitor_id):
+    """Учитывает просмотр записи посетителем."""
+    def count(views):
+        if views is None:
+            views = [0, HyperLogLog()]
+        views[0] += 1
+        views[1].add(visitor_id)
+        return views
+    batch.update((post_id, timezone.localdate()), count)
+
+
+def counts_views(view):
+    """Считает успешные GET-ответы view(request, post_id).
+
+    Ставится над кешем страниц, чтобы считались и ответы из кеша.
+    """
+    @wraps(view)
+    def wrapper(request, post_id, *args, **kwargs):
+        response = view(request, post_id, *args, **kwargs)
+        if request.method == 'GET' and response.status_code == 200:
+            record(post_id, visitor(request))
+        return response
+    return wrapper
+
+
+def merge(saved, views):
+    """Складывает просмотры и посетителей одного дня записи."""
+    if saved is None:
+        return views
+    saved[0] += views[0]
+    saved[1].merge(views[1].registers)
+    return saved
+
+
+def save(pending):
+    """Прибавляет пачку {(запись, день): [просмотры, посетители]}."""
+    with transaction.atomic():
+        while pending:
+            saved = {}
+            for row in PostViews.objects.select_for_update().filter(
+                    post_id__in={post_id for post_id, _ in pending},
+                    day__in={day for _, day in pending}
+            ).only('pk', 'post_id', 'day', 'visitors'):
+                if (row.post_id, row.day) in pending:
+                    saved[row.post_id, row.day] = row
+            for key, row in saved.items():
+                views, visitors = pending[key]
+                # Буфер не меняется: при ошибке пачка вернется в него.
+                merged = HyperLogLog(visitors.registers)
+                merged.merge(row.visitors)
+                row.views = models.F('views') + views
+                row.visitors = bytes(merged.registers)
+            PostViews.objects.bulk_update(
+                saved.values(), ['views', 'visitors'])
+            pending = {
+                key: views for key, views in pending.items()
+                if key not in saved
+            }
+            # Запись могла быть удалена, пока просмотры ждали сохранения.
+            alive = set(Post.objects.filter(
+                pk__in={post_id for post_id, _ in pending}
+            ).values_list('pk', flat=True))
+            try:
+                with transaction.atomic():
+                    PostViews.objects.bulk_create([
+                        PostViews(post_id=post_id, day=day, views=views,
+                                  visitors=bytes(visitors.registers))
+                        for (post_id, day), (views, visitors)
+                        in pending.items() if post_id in alive
+                    ])
+                return
+            except IntegrityError:
+                # Часть строк успел создать другой процесс: перечитываем.
+                pending = {
+                    key: views for key, views in pending.items()
+                    if key[0] in alive
+                }
+
+
+batch = Batch('analytics', save, merge, 'ANALYTICS_FLUSH_INTERVAL')
+
+
+def flush():
+    """Сохраняет накопленные процессом просмотры."""
+    batch.flush()
+
+
+def totals(post_id):
+    """(просмотры, уникальные посетители) записи за все время."""
+    views, visitors = 0, HyperLogLog()
+    for day_views, registers in PostViews.objects.filter(
+            post_id=post_id).values_list('views', 'visitors'):
+        views += day_views
+        visitors.merge(registers)
+    return views, len(visitors)
+
+
+def report(days, limit):
+    """Самые просматриваемые за days дней записи с просмотрами
+    (view_count) и оценкой уникальных посетителей (visitor_count)."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    recent = PostViews.objects.filter(day__gte=since)
+    top = list(
+        recent.values('post_id').annotate(
+            total=models.Sum('views')).order_by('-total', 'post_id')[:limit]
+    )
+    ids = [row['post_id'] for row in top]
+    sketches = {post_id: HyperLogLog() for post_id in ids}
+    for post_id, registers in recent.filter(
+            post_id__in=ids).values_list('post_id', 'visitors'):
+        sketches[post_id].merge(registers)
+    posts = Post.objects.select_related('author').in_bulk(ids)
+    rows = []
+    for row in top:
+        post = posts.get(row['post_id'])
+        if post is not None:
+            post.view_count = row['total']
+            post.visitor_count = len(sketches[post.pk])
+            rows.append(post)
+    return rows
@@ -0,0 +1,176 @@
+"""Кеширование страниц с инвалидацией по версиям.
+
+Каждая страница зависит от нескольких областей (scopes): вся лента,
+группа, автор, запись. У области есть счетчик версии, сигналы моделей
+увеличивают его при изменении содержимого. Версии хранятся вместе
+со страницей, поэтому страница живет в кеше долго и устаревает ровно
+тогда, когда меняется то, что на ней показано.
+"""
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.metrics import PAGE_CACHE, registry, view_name
+
+VERSION_KEY = 'posts:version:{}'
+PAGE_KEY = 'posts:page:{}'
+
+# Сколько держится блокировка пересборки и сколько ждать чужой
+# пересборки, если отдать пока нечего.
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 2
+POLL_INTERVAL = 0.05
+
+GLOBAL = 'global'
+GROUPS = 'groups'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def comments_scope(post_id):
+    return f'comments:{post_id}'
+
+
+def _initial_version():
+    # После вытеснения счетчика версия не должна совпасть со старой,
+    # иначе из кеша вернутся устаревшие страницы.
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает устаревшими все страницы, зависящие от scopes."""
+    for scope in set(scopes):
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+
+
+def page_key(request, per_user=True):
+    # Анонимам отдаем общую копию, авторизованным - свою: в странице
+    # есть имя пользователя и CSRF-токен, привязанный к cookie.
+    viewer = (
+        request.META.get('HTTP_COOKIE', '')
+        if per_user and request.user.is_authenticated else ''
+    )
+    digest = hashlib.md5(
+        f'{request.get_full_path()}|{viewer}'.encode()
+    ).hexdigest()
+    return PAGE_KEY.format(digest)
+
+
+class Entry:
+    """Закешированный ответ вместе с условиями его свежести."""
+
+    def __init__(self, response, versions, soft_expires, delta):
+        self.response = response
+        self.versions = versions
+        self.soft_expires = soft_expires
+        self.delta = delta
+
+    def is_fresh(self, versions, beta):
+        if self.versions != versions:
+            return False
+        if self.soft_expires is None:
+            return True
+        # Вероятностное раннее истечение (XFetch): чем дольше строится
+        # страница и чем ближе мягкий срок, тем вероятнее пересборка
+        # до него, поэтому процессы не приходят за ней одновременно.
+        early = self.delta * beta * -math.log(1 - random.random())
+        return time.time() + early < self.soft_expires
+
+
+def wait_for_entry(key, versions):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry.versions == versions:
+            return entry
+    return None
+
+
+def revalidate(key, entry, versions, render):
+    """Пересобирает страницу под блокировкой или отдает старую копию."""
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            return render()
+        finally:
+            cache.delete(lock)
+    if entry is None:
+        entry = wait_for_entry(key, versions)
+    if entry is None:
+        return render(store=False)
+    return entry.response
+
+
+def cache_page_versioned(scopes, soft_ttl=None, hard_ttl=None, beta=1.0,
+                         per_user=True):
+    """Кеширует успешные GET-ответы view до смены версий scopes.
+
+    scopes(request, *args, **kwargs) возвращает области, от которых
+    зависит страница. Запись хранится hard_ttl секунд. per_user=False
+    для фрагментов, одинаковых для всех пользователей.
+
+    С soft_ttl страница через soft_ttl секунд или после смены версии
+    считается устаревшей: ее пересобирает один процесс под блокировкой,
+    а остальные пока получают старую копию. beta управляет ранним
+    истечением, 0 отключает его.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = page_key(request, per_user)
+            versions = get_versions(scopes(request, *args, **kwargs))
+            entry = cache.get(key)
+            if entry is not None and entry.is_fresh(versions, beta):
+                registry.inc(PAGE_CACHE, view=view_name(request), result='hit')
+                return entry.response
+            registry.inc(PAGE_CACHE, view=view_name(request), result='miss')
+
+            def render(store=True):
+                started = time.monotonic()
+                response = view(request, *args, **kwargs)
+                if (store and response.status_code == 200
+                        and not response.streaming):
+                    cache.set(key, Entry(
+                        response, versions,
+                        soft_ttl and time.time() + soft_ttl,
+                        time.monotonic() - started,
+                    ), hard_ttl or settings.PAGE_CACHE_TIMEOUT)
+                return response
+
+            if soft_ttl is None:
+                return render()
+            return revalidate(key, entry, versions, render)
+        return wrapper
+    return decorator
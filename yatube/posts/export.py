@@ -0,0 +1,105 @@
+"""Потоковая выгрузка записей, комментариев, групп и подписок.
+
+Строки читаются пачками по ключу (pk > последнего в прошлой пачке), а
+не через OFFSET или один большой SELECT, и сразу пишутся в JSONL или
+CSV, при желании сжатые gzip. Память не растет с размером таблицы.
+Поля записей, комментариев и подписок совпадают с форматом
+import_yatube, так что выгрузку можно загрузить обратно.
+"""
+import csv
+import io
+import json
+import zlib
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE = 2000
+
+EXPORTS = {
+    # Тип выгрузки: модель и {столбец: поле для values_list}.
+    'posts': (Post, {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    'comments': (Comment, {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'pub_date': 'pub_date',
+    }),
+    'groups': (Group, {
+        'id': 'pk',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'follows': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+KINDS = {model: kind for kind, (model, _) in EXPORTS.items()}
+
+
+def rows(kind, queryset=None, chunk_size=CHUNK_SIZE):
+    """Словари строк выгрузки kind из queryset (по умолчанию всех)."""
+    model, columns = EXPORTS[kind]
+    queryset = (
+        model.objects.all() if queryset is None else queryset
+    ).order_by('pk')
+    names = list(columns)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        values = list(
+            chunk.values_list('pk', *columns.values())[:chunk_size]
+        )
+        if not values:
+            return
+        last = values[-1][0]
+        for pk, *row in values:
+            yield {
+                name: value.isoformat() if hasattr(value, 'isoformat')
+                else value
+                for name, value in zip(names, row)
+            }
+
+
+def lines(kind, fmt, rows):
+    """Строки файла выгрузки; у CSV первая строка — заголовок."""
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORTS[kind][1])
+    for row in rows:
+        writer.writerow(row.values())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(lines, min_size=64 * 1024):
+    """Сжимает строки в поток gzip кусками не меньше min_size."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    pending = []
+    size = 0
+    for line in lines:
+        data = compressor.compress(line.encode())
+        if data:
+            pending.append(data)
+            size += len(data)
+        if size >= min_size:
+            yield b''.join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
@@ -0,0 +1,219 @@
+"""Граф подписок в памяти процесса.
+
+Для каждого пользователя хранятся отсортированные массивы id тех, на
+кого он подписан, и его подписчиков (array, 8 байт на связь). Проверка
+подписки — двоичный поиск, число подписчиков — длина массива, а
+рекомендации «на кого подписаться» (авторы, на которых подписаны ваши
+авторы) считаются обходом массивов без самосоединения Follow в базе.
+
+Граф строится из базы при первом обращении и дальше меняется по
+сигналам. Другие процессы узнают об изменениях через кеш: сигнал
+увеличивает счетчик версии графа и кладет изменение под ее номером.
+Процесс, отставший на несколько версий, применяет пропущенные
+изменения, а если какого-то нет (вытеснено, очищен кеш, массовая
+загрузка через invalidate()) — перестраивает граф из базы.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.core.cache import cache
+
+from .models import Follow
+
+VERSION_KEY = 'posts:follow_graph:version'
+CHANGE_KEY = 'posts:follow_graph:change:{}'
+# Сколько держится изменение и сколько изменений догонять по одному.
+CHANGE_TIMEOUT = 60 * 60
+MAX_REPLAY = 1000
+# Сколько своих авторов смотреть при подборе и сколько популярных
+# авторов держать для добора рекомендаций.
+MAX_FANOUT = 200
+POPULAR_SIZE = 50
+
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
+
+EMPTY = array('q')
+
+
+def _initial_version():
+    # Как у версий страниц: после вытеснения счетчик не совпадет со
+    # старым, и отставшие процессы перестроят граф.
+    return int(time.time() * 1000)
+
+
+def _insert(index, key, value):
+    values = index.setdefault(key, array('q'))
+    position = bisect_left(values, value)
+    if position == len(values) or values[position] != value:
+        values.insert(position, value)
+
+
+def _remove(index, key, value):
+    values = index.get(key, EMPTY)
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+
+
+def _contains(values, value):
+    position = bisect_left(values, value)
+    return position < len(values) and values[position] == value
+
+
+class FollowGraph:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._following = {}
+        self._followers = {}
+        self._version = None
+        self._popular = None
+
+    def is_following(self, user_id, author_id):
+        with self._synced():
+            return _contains(self._following.get(user_id, EMPTY), author_id)
+
+    def followers_count(self, author_id):
+        with self._synced():
+            return len(self._followers.get(author_id, EMPTY))
+
+    def following(self, user_id):
+        with self._synced():
+            return list(self._following.get(user_id, EMPTY))
+
+    def suggestions(self, user_id, limit):
+        """id авторов, на которых подписаны авторы user_id, по числу
+        таких подписок и популярности; добираются популярными."""
+        with self._synced():
+            following = self._following.get(user_id, EMPTY)
+            scores = Counter()
+            for author_id in following[:MAX_FANOUT]:
+                scores.update(self._following.get(author_id, EMPTY))
+            excluded = set(following)
+            excluded.add(user_id)
+            ranked = sorted(
+                (author for author in scores if author not in excluded),
+                key=lambda author: (
+                    -scores[author], -self._popularity(author), author
+                ),
+            )[:limit]
+            for author_id in self._popular_authors():
+                if len(ranked) >= limit:
+                    break
+                if author_id not in excluded and author_id not in ranked:
+                    ranked.append(author_id)
+            return ranked
+
+    def follow(self, user_id, author_id):
+        self._publish(FOLLOW, user_id, author_id)
+
+    def unfollow(self, user_id, author_id):
+        self._publish(UNFOLLOW, user_id, author_id)
+
+    def invalidate(self):
+        """Заставляет все процессы перестроить граф из базы."""
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            pass
+        with self._lock:
+            self._version = None
+
+    def _popularity(self, author_id):
+        return len(self._followers.get(author_id, EMPTY))
+
+    def _popular_authors(self):
+        if self._popular is None:
+            self._popular = heapq.nlargest(
+                POPULAR_SIZE, self._followers,
+                key=lambda author: (self._popularity(author), -author)
+            )
+        return self._popular
+
+    def _synced(self):
+        self._sync()
+        return self._lock
+
+    def _current_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, _initial_version(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _sync(self):
+        version = self._current_version()
+        with self._lock:
+            if version == self._version:
+                return
+            if (self._version is not None
+                    and 0 < version - self._version <= MAX_REPLAY):
+                keys = [
+                    CHANGE_KEY.format(number)
+                    for number in range(self._version + 1, version + 1)
+                ]
+                changes = cache.get_many(keys)
+                if len(changes) == len(keys):
+                    for key in keys:
+                        self._apply(*changes[key])
+                    self._version = version
+                    return
+            self._rebuild()
+            self._version = version
+
+    def _publish(self, op, user_id, author_id):
+        with self._lock:
+            self._apply(op, user_id, author_id)
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            # Счетчика нет: все процессы и так перестроят граф.
+            return
+        cache.set(
+            CHANGE_KEY.format(version), (op, user_id, author_id),
+            CHANGE_TIMEOUT
+        )
+        with self._lock:
+            if self._version == version - 1:
+                self._version = version
+
+    def _apply(self, op, user_id, author_id):
+        # Изменения идемпотентны: повтор после перестройки безвреден.
+        if op == FOLLOW:
+            _insert(self._following, user_id, author_id)
+            _insert(self._followers, author_id, user_id)
+        else:
+            _remove(self._following, user_id, author_id)
+            _remove(self._followers, author_id, user_id)
+        self._popular = None
+
+    def _rebuild(self):
+        # Оба обхода идут по индексам (user, author) и (author, user).
+        self._following = self._load(
+            Follow.objects.order_by('user_id', 'author_id')
+            .values_list('user_id', 'author_id')
+        )
+        self._followers = self._load(
+            Follow.objects.order_by('author_id', 'user_id')
+            .values_list('author_id', 'user_id')
+        )
+        self._popular = None
+
+    @staticmethod
+    def _load(pairs):
+        """{ключ: массив значений} из пар, отсортированных по ключу."""
+        index = {}
+        last = values = None
+        for key, value in pairs.iterator():
+            if key != last:
+                last, values = key, array('q')
+                index[key] = values
+            values.append(value)
+        return index
+
+
+follow_graph = FollowGraph()
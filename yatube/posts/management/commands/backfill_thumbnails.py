@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры картинок всех записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True).iterator()
+        results = {True: 0, False: 0}
+
+        def collect(done):
+            for future in done:
+                results[future.result() is not None] += 1
+
+        # Pillow отпускает GIL при разборе и сжатии, поэтому хватает
+        # потоков. В очереди держим немного задач, чтобы не читать
+        # все записи в память.
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for name in names:
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(thumbnails.run, name))
+            collect(wait(pending).done)
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюр готово: {results[True]}, ошибок: {results[False]}'
+        ))
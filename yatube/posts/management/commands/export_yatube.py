@@ -0,0 +1,56 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.export import CHUNK_SIZE, EXPORTS, lines, rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает записи, комментарии, группы или подписки в JSONL или CSV '
+        'потоком; файл с расширением .gz сжимается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORTS)
+        parser.add_argument('path', help='Файл или - для stdout')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        name = path[:-len('.gz')] if path.endswith('.gz') else path
+        fmt = options['format'] or (
+            'csv' if name.endswith('.csv') else 'jsonl'
+        )
+        exported = 0
+
+        def counted(rows):
+            nonlocal exported
+            for exported, row in enumerate(rows, 1):
+                yield row
+
+        started = time.perf_counter()
+        output = self.open(path)
+        try:
+            output.writelines(lines(kind, fmt, counted(
+                rows(kind, chunk_size=options['chunk_size'])
+            )))
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено: {exported}, '
+            f'{exported / max(elapsed, 1e-9):,.0f} строк/с'
+        ))
+
+    @staticmethod
+    def open(path):
+        if path == '-':
+            return sys.stdout
+        if path.endswith('.gz'):
+            return gzip.open(path, 'wt', encoding='utf-8', newline='')
+        return open(path, 'w', encoding='utf-8', newline='')
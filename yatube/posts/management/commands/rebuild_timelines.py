@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache
+from posts.models import Follow, TimelineEntry, User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок с нуля'
+
+    def handle(self, *args, **options):
+        owners = set(TimelineEntry.objects.values_list(
+            'user_id', flat=True).distinct())
+        TimelineEntry.objects.rebuild()
+        # Страницы владельцев старых и новых лент могли устареть.
+        owners.update(Follow.objects.values_list('user_id', flat=True))
+        cache.bump(*(
+            cache.author_scope(username) for username in
+            User.objects.filter(pk__in=owners).values_list(
+                'username', flat=True).iterator()
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано, записей: {TimelineEntry.objects.count()}'
+        ))
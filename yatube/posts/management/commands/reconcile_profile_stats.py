@@ -0,0 +1,73 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import cache
+from posts.models import Comment, Follow, Post, ProfileStats, User
+
+FIELDS = ('posts_count', 'comments_count', 'follows_count', 'followers_count')
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на пользователя."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count'),
+        output_field=IntegerField()
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики профилей с исходными таблицами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = User.objects.order_by('pk').annotate(
+            posts_count=count_of(Post, 'author'),
+            comments_count=count_of(Comment, 'author'),
+            follows_count=count_of(Follow, 'user'),
+            followers_count=count_of(Follow, 'author'),
+        ).values_list('pk', *FIELDS).iterator()
+        fixed = []
+        while True:
+            batch = list(islice(rows, options['batch_size']))
+            if not batch:
+                break
+            fixed += self.reconcile(batch)
+        # Профили с неверными счетчиками могли попасть в кеш страниц.
+        cache.bump(*(
+            cache.author_scope(username) for username in
+            User.objects.filter(pk__in=fixed).values_list(
+                'username', flat=True).iterator()
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено профилей: {len(fixed)}'
+        ))
+
+    @staticmethod
+    def reconcile(batch):
+        """Исправляет счетчики пачки, возвращает id исправленных."""
+        existing = ProfileStats.objects.in_bulk([row[0] for row in batch])
+        to_create, to_update = [], []
+        for user_id, *counts in batch:
+            expected = dict(zip(FIELDS, counts))
+            stats = existing.get(user_id)
+            if stats is None:
+                to_create.append(ProfileStats(user_id=user_id, **expected))
+            elif any(getattr(stats, field) != value
+                     for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(stats, field, value)
+                to_update.append(stats)
+        with transaction.atomic():
+            ProfileStats.objects.bulk_create(to_create)
+            ProfileStats.objects.bulk_update(to_update, FIELDS)
+        return [stats.user_id for stats in to_create + to_update]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0018_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='Владелец профиля', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Записи')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментарии')),
+                ('follows_count', models.PositiveIntegerField(default=0, verbose_name='Подписки')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчики')),
+            ],
+            options={
+                'verbose_name': 'Статистика профиля',
+                'verbose_name_plural': 'Статистика профилей',
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.search
+
+
+def install_search(apps, schema_editor):
+    posts.search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    posts.search.uninstall(schema_editor.connection)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_profilestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentIndex',
+            fields=[
+                ('text', posts.search.IndexedTextField()),
+                ('rank', models.FloatField()),
+                ('comment', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.Comment')),
+            ],
+            options={
+                'db_table': 'posts_comment_fts',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PostIndex',
+            fields=[
+                ('text', posts.search.IndexedTextField()),
+                ('rank', models.FloatField()),
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.Post')),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupTrend',
+            fields=[
+                ('rank', models.FloatField(db_index=True, verbose_name='Рейтинг')),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Популярность группы',
+                'verbose_name_plural': 'Популярность групп',
+                'ordering': ('-rank',),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTrend',
+            fields=[
+                ('rank', models.FloatField(db_index=True, verbose_name='Рейтинг')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='posts.Post', verbose_name='Запись')),
+            ],
+            options={
+                'verbose_name': 'Популярность записи',
+                'verbose_name_plural': 'Популярность записей',
+                'ordering': ('-rank',),
+                'abstract': False,
+            },
+        ),
+    ]
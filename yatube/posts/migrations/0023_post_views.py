@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_trends'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViews',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('visitors', models.BinaryField(verbose_name='Посетители')),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='posts.Post', verbose_name='Запись')),
+            ],
+            options={
+                'verbose_name': 'Просмотры записи',
+                'verbose_name_plural': 'Просмотры записей',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postviews',
+            index=models.Index(fields=['day'], name='post_views_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postviews',
+            constraint=models.UniqueConstraint(fields=('post', 'day'), name='unique_post_views_day'),
+        ),
+    ]
@@ -1,11 +1,21 @@
+from itertools import islice
+
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
 
 from core.models import CreatedModel
 
+from .search import IndexedTextField, to_match
+
 User = get_user_model()
 
+bulk_created = Signal(providing_args=['objs'])
+
+COMMENT_MATCH_WEIGHT = 0.5
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -31,13 +41,75 @@ class Group(models.Model):
         return self.title
 
 
+class BulkCreatedQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, send_signal=True, **kwargs):
+        """bulk_create не шлёт post_save, вместо него шлем bulk_created.
+
+        send_signal=False нужен массовому импорту: он пересобирает
+        производные данные один раз в конце.
+        """
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if send_signal:
+            bulk_created.send(sender=self.model, objs=objs)
+        return objs
+
+
+class PostQuerySet(BulkCreatedQuerySet):
+    def with_related(self):
+        """Подтягивает автора и группу, нужные карточке записи."""
+        return self.select_related('author', 'group')
+
+    def with_details(self):
+        """Добавляет число записей автора."""
+        return self.with_related().annotate(
+            author_posts_count=models.Count('author__posts')
+        )
+
+    def search(self, query):
+        """Записи, подходящие под запрос сами или комментариями,
+        с оценкой search_score.
+
+        Чем выше оценка, тем релевантнее запись. Совпадение в
+        комментарии весит COMMENT_MATCH_WEIGHT от совпадения в записи.
+        """
+        match = to_match(query)
+        if not match:
+            return self.annotate(search_score=models.Value(
+                0.0, output_field=models.FloatField())).none()
+        # MATCH в OR не поддерживается FTS5, поэтому оба совпадения —
+        # подзапросы по индексам.
+        post_ranks = PostIndex.objects.filter(text__match=match)
+        comment_ranks = CommentIndex.objects.filter(text__match=match)
+        return self.filter(
+            models.Q(pk__in=post_ranks.values('post'))
+            | models.Q(pk__in=comment_ranks.values('comment__post'))
+        ).annotate(
+            search_score=(
+                -Coalesce(models.Subquery(
+                    post_ranks.filter(post=models.OuterRef('pk'))
+                    .values('rank')[:1],
+                    output_field=models.FloatField()
+                ), 0.0)
+                - COMMENT_MATCH_WEIGHT * Coalesce(models.Subquery(
+                    comment_ranks.filter(
+                        comment__post=models.OuterRef('pk')
+                    ).order_by('rank').values('rank')[:1],
+                    output_field=models.FloatField()
+                ), 0.0)
+            )
+        )
+
+
 class Post(CreatedModel):
     text = models.TextField(
         'Текст записи',
         help_text='Введите текст записи')
+    # Отдельные индексы внешних ключей не нужны: их заменяют составные
+    # индексы из Meta, которые начинаются с тех же полей.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='posts',
         verbose_name='Автор',
         help_text='Автор этой записи'
@@ -47,6 +119,7 @@ class Post(CreatedModel):
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
+        db_index=False,
         related_name='posts',
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться запись'
@@ -58,18 +131,57 @@ class Post(CreatedModel):
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta(CreatedModel.Meta):
         verbose_name = 'Запись'
         verbose_name_plural = 'Записи'
+        # Ленты автора и группы выбираются по ключу и идут от новых к
+        # старым, как в CursorPaginator, без сортировки во временном
+        # B-дереве.
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class SearchIndex(models.Model):
+    """Строка FTS5-индекса, см. posts.search."""
+    text = IndexedTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        abstract = True
+        managed = False
+
+
+class PostIndex(SearchIndex):
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_index'
+    )
+
+    class Meta(SearchIndex.Meta):
+        db_table = 'posts_post_fts'
+
+
 class Comment(CreatedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='comments',
         verbose_name='Запись',
         help_text='Запись, к которой будет относиться комментарий'
@@ -89,15 +201,37 @@ class Comment(CreatedModel):
     class Meta(CreatedModel.Meta):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date', '-id'],
+                name='comment_post_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class CommentIndex(SearchIndex):
+    comment = models.OneToOneField(
+        Comment,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_index'
+    )
+
+    class Meta(SearchIndex.Meta):
+        db_table = 'posts_comment_fts'
+
+
 class Follow(models.Model):
+    # Поиск по подписчику покрывает уникальное ограничение (user, author),
+    # по автору — индекс (author, user).
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='follower',
         verbose_name='Подписчик',
         help_text='Подписчик'
@@ -105,6 +239,7 @@ class Follow(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='following',
         verbose_name='Автор',
         help_text='Автор'
@@ -112,9 +247,17 @@ class Follow(models.Model):
 
     FOLLOW_PHRASE = '{user} подписался на {author}'
 
+    objects = BulkCreatedQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -127,3 +270,283 @@ class Follow(models.Model):
             user=self.user.username,
             author=self.author.username
         )
+
+
+class TimelineManager(models.Manager):
+    """Поддерживает материализованные ленты подписок."""
+    BATCH_SIZE = 1000
+
+    def _insert(self, entries):
+        entries = iter(entries)
+        while True:
+            batch = list(islice(entries, self.BATCH_SIZE))
+            if not batch:
+                return
+            self.bulk_create(batch, ignore_conflicts=True)
+
+    def fan_out(self, post):
+        """Раскладывает новую запись в ленты всех подписчиков автора."""
+        followers = Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True)
+        with transaction.atomic():
+            self._insert(
+                self.model(
+                    user_id=user_id,
+                    post_id=post.pk,
+                    author_id=post.author_id,
+                    pub_date=post.pub_date,
+                )
+                for user_id in followers.iterator(chunk_size=self.BATCH_SIZE)
+            )
+
+    def fan_out_many(self, posts):
+        """Раскладывает пачку записей, у которых может не быть pk."""
+        if not posts:
+            return
+        since = min(post.pub_date for post in posts)
+        follows = Follow.objects.filter(
+            author_id__in={post.author_id for post in posts}
+        ).values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            self.backfill(user_id, author_id, since=since)
+
+    def backfill(self, user_id, author_id, since=None):
+        """Добавляет в ленту подписчика записи автора."""
+        posts = Post.objects.filter(author_id=author_id)
+        if since is not None:
+            posts = posts.filter(pub_date__gte=since)
+        posts = posts.values_list('pk', 'pub_date')
+        with transaction.atomic():
+            self._insert(
+                self.model(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for post_id, pub_date in posts.iterator(
+                    chunk_size=self.BATCH_SIZE)
+            )
+
+    def prune(self, user_id, author_id):
+        """Убирает из ленты подписчика записи автора."""
+        return self.filter(user_id=user_id, author_id=author_id).delete()
+
+    def rebuild(self):
+        """Пересобирает все ленты по таблице подписок.
+
+        Строки лент собираются одним INSERT ... SELECT в базе: при
+        популярных авторах их миллионы, и поштучная сборка объектов
+        в Python заняла бы на порядки больше времени.
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            self.all().delete()
+            cursor.execute(
+                f'INSERT INTO {quote(self.model._meta.db_table)} '
+                f'(user_id, post_id, author_id, pub_date) '
+                f'SELECT follow.user_id, post.id, post.author_id, '
+                f'post.pub_date '
+                f'FROM {quote(Follow._meta.db_table)} follow '
+                f'JOIN {quote(Post._meta.db_table)} post '
+                f'ON post.author_id = follow.author_id'
+            )
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+        help_text='Владелец ленты'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Запись',
+        help_text='Запись в ленте'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+        help_text='Автор записи'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = TimelineManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class ProfileStatsManager(models.Manager):
+    """Поддерживает счетчики профиля в актуальном состоянии."""
+
+    def counts(self, user_id):
+        """Считает значения счетчиков по исходным таблицам."""
+        return {
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'comments_count': Comment.objects.filter(
+                author_id=user_id).count(),
+            'follows_count': Follow.objects.filter(user_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id).count(),
+        }
+
+    def recount(self, user_id):
+        stats, _ = self.update_or_create(
+            user_id=user_id, defaults=self.counts(user_id)
+        )
+        return stats
+
+    def for_user(self, user):
+        try:
+            return user.profile_stats
+        except self.model.DoesNotExist:
+            return self.recount(user.pk)
+
+    def increment(self, user_id, field, delta=1):
+        """Увеличивает счетчик, создавая строку при ее отсутствии."""
+        with transaction.atomic():
+            if not self.filter(user_id=user_id).update(
+                    **{field: models.F(field) + delta}):
+                self.recount(user_id)
+
+    def decrement(self, user_id, field):
+        """Уменьшает счетчик, если строка уже есть.
+
+        Отсутствующую строку не создаем: удаление может идти каскадом
+        вместе с самим пользователем.
+        """
+        self.filter(user_id=user_id, **{f'{field}__gt': 0}).update(
+            **{field: models.F(field) - 1}
+        )
+
+
+class ProfileStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile_stats',
+        verbose_name='Пользователь',
+        help_text='Владелец профиля'
+    )
+    posts_count = models.PositiveIntegerField('Записи', default=0)
+    comments_count = models.PositiveIntegerField('Комментарии', default=0)
+    follows_count = models.PositiveIntegerField('Подписки', default=0)
+    followers_count = models.PositiveIntegerField('Подписчики', default=0)
+
+    objects = ProfileStatsManager()
+
+    class Meta:
+        verbose_name = 'Статистика профиля'
+        verbose_name_plural = 'Статистика профилей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class Trend(models.Model):
+    """Недавняя активность с экспоненциальным затуханием, см. posts.trending.
+
+    rank — log2 активности, приведенной к общему моменту, поэтому строки
+    сравниваются без пересчета и сортируются по индексу.
+    """
+    rank = models.FloatField('Рейтинг', db_index=True)
+
+    class Meta:
+        abstract = True
+        ordering = ('-rank',)
+
+
+class PostTrend(Trend):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend',
+        verbose_name='Запись'
+    )
+
+    class Meta(Trend.Meta):
+        verbose_name = 'Популярность записи'
+        verbose_name_plural = 'Популярность записей'
+
+    def __str__(self):
+        return str(self.post_id)
+
+
+class GroupTrend(Trend):
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend',
+        verbose_name='Группа'
+    )
+
+    class Meta(Trend.Meta):
+        verbose_name = 'Популярность группы'
+        verbose_name_plural = 'Популярность групп'
+
+    def __str__(self):
+        return str(self.group_id)
+
+
+class PostViews(models.Model):
+    """Просмотры записи за день, см. posts.analytics.
+
+    visitors — регистры HyperLogLog для оценки числа уникальных
+    посетителей: по байту на регистр, независимо от их числа.
+    """
+    # Индекс внешнего ключа заменяет уникальное ограничение (post, day).
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='daily_views',
+        verbose_name='Запись'
+    )
+    day = models.DateField('День')
+    views = models.PositiveIntegerField('Просмотры', default=0)
+    visitors = models.BinaryField('Посетители')
+
+    class Meta:
+        verbose_name = 'Просмотры записи'
+        verbose_name_plural = 'Просмотры записей'
+        indexes = [
+            models.Index(fields=['day'], name='post_views_day_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'day'],
+                name='unique_post_views_day'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.day}'
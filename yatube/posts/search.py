@@ -0,0 +1,110 @@
+"""Полнотекстовый поиск по записям и комментариям на SQLite FTS5.
+
+Для текстов записей и комментариев заведены внешние FTS5-индексы
+(content= указывает на исходную таблицу, текст в индексе не дублируется).
+Индексы обновляют триггеры, поэтому в них попадают и bulk_create, и
+update() мимо сигналов. Модели PostIndex и CommentIndex позволяют
+обращаться к индексам из ORM: условие text__match ищет по индексу, а
+поле rank дает его оценку bm25 (чем меньше, тем релевантнее).
+
+Миграции SQLite, пересоздающие таблицу, удаляют ее триггеры, поэтому
+install вызывается и после каждого migrate и восстанавливает их.
+"""
+import re
+
+from django.db import models
+
+TOKEN = re.compile(r'\w+')
+
+INDEXES = {
+    # Таблица индекса: индексируемая таблица.
+    'posts_post_fts': 'posts_post',
+    'posts_comment_fts': 'posts_comment',
+}
+
+CREATE_INDEX = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+    text, content='{table}', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+'''
+
+TRIGGERS = {
+    '{index}_insert': '''
+CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO {index} (rowid, text) VALUES (new.id, new.text);
+END
+''',
+    '{index}_delete': '''
+CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO {index} ({index}, rowid, text)
+    VALUES ('delete', old.id, old.text);
+END
+''',
+    '{index}_update': '''
+CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF text ON {table}
+BEGIN
+    INSERT INTO {index} ({index}, rowid, text)
+    VALUES ('delete', old.id, old.text);
+    INSERT INTO {index} (rowid, text) VALUES (new.id, new.text);
+END
+''',
+}
+
+
+def install(connection):
+    """Создает индексы и триггеры, которых нет; такие индексы
+    перестраиваются по исходной таблице."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        for index, table in INDEXES.items():
+            names = [index] + [name.format(index=index) for name in TRIGGERS]
+            if existing.issuperset(names):
+                continue
+            cursor.execute(CREATE_INDEX.format(index=index, table=table))
+            for sql in TRIGGERS.values():
+                cursor.execute(sql.format(index=index, table=table))
+            cursor.execute(
+                f"INSERT INTO {index} ({index}) VALUES ('rebuild')"
+            )
+
+
+def uninstall(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for index in INDEXES:
+            for name in TRIGGERS:
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {name.format(index=index)}'
+                )
+            cursor.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+def to_match(query):
+    """Переводит строку из формы поиска в запрос FTS5.
+
+    Каждое слово берется в кавычки, чтобы символы синтаксиса FTS5 не
+    ломали запрос, и ищется как префикс; все слова должны встретиться.
+    Возвращает пустую строку, если слов нет.
+    """
+    return ' '.join(f'"{word}"*' for word in TOKEN.findall(query))
+
+
+class IndexedTextField(models.TextField):
+    """Столбец FTS5-индекса, поддерживает условие __match."""
+
+
+@IndexedTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
@@ -0,0 +1,224 @@
+from collections import Counter
+
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cache, search, thumbnails, trending
+from .graph import follow_graph
+from .models import (Comment, Follow, Group, Post, ProfileStats,
+                     TimelineEntry, User, bulk_created)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    """Новая запись попадает в ленты подписчиков автора."""
+    if created:
+        TimelineEntry.objects.fan_out(instance)
+
+
+@receiver(bulk_created, sender=Post)
+def fan_out_posts(sender, objs, **kwargs):
+    TimelineEntry.objects.fan_out_many(objs)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    """При подписке лента дополняется записями автора."""
+    if created:
+        TimelineEntry.objects.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(bulk_created, sender=Follow)
+def backfill_timelines(sender, objs, **kwargs):
+    for follow in objs:
+        TimelineEntry.objects.backfill(follow.user_id, follow.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    """При отписке записи автора убираются из ленты."""
+    TimelineEntry.objects.prune(instance.user_id, instance.author_id)
+
+
+STATS_COUNTERS = {
+    Post: [('author_id', 'posts_count')],
+    Comment: [('author_id', 'comments_count')],
+    Follow: [('user_id', 'follows_count'), ('author_id', 'followers_count')],
+}
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, **kwargs):
+    """У нового пользователя счетчики нулевые, пересчет не нужен."""
+    if created:
+        ProfileStats.objects.get_or_create(user_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Follow)
+def increment_stats(sender, instance, created, **kwargs):
+    """Новые записи, комментарии и подписки увеличивают счетчики."""
+    if created:
+        for user_field, counter in STATS_COUNTERS[sender]:
+            ProfileStats.objects.increment(
+                getattr(instance, user_field), counter
+            )
+
+
+@receiver(bulk_created, sender=Post)
+def increment_posts_stats(sender, objs, **kwargs):
+    for author_id, count in Counter(post.author_id for post in objs).items():
+        ProfileStats.objects.increment(author_id, 'posts_count', count)
+
+
+@receiver(bulk_created, sender=Follow)
+def recount_follows_stats(sender, objs, **kwargs):
+    # С ignore_conflicts вставлены не все подписки пачки, поэтому
+    # счетчики пересчитываются, а не увеличиваются.
+    for user_id in {user_id for follow in objs
+                    for user_id in (follow.user_id, follow.author_id)}:
+        ProfileStats.objects.recount(user_id)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+def decrement_stats(sender, instance, **kwargs):
+    """Удаления уменьшают счетчики."""
+    for user_field, counter in STATS_COUNTERS[sender]:
+        ProfileStats.objects.decrement(getattr(instance, user_field), counter)
+
+
+def author_scopes(*user_ids):
+    return [
+        cache.author_scope(username)
+        for username in User.objects.filter(
+            pk__in=user_ids).values_list('username', flat=True)
+    ]
+
+
+def post_scopes(posts, group_ids=()):
+    group_ids = {post.group_id for post in posts}.union(group_ids)
+    group_ids.discard(None)
+    return [
+        cache.GLOBAL,
+        *(cache.post_scope(post.pk) for post in posts if post.pk),
+        *(cache.group_scope(slug) for slug in Group.objects.filter(
+            pk__in=group_ids).values_list('slug', flat=True)),
+        *author_scopes(*{post.author_id for post in posts}),
+    ]
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Запоминает прежнюю группу, чтобы сбросить и ее страницы."""
+    instance.previous_group_id = (
+        Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_pages(sender, instance, **kwargs):
+    cache.bump(*post_scopes(
+        [instance], [getattr(instance, 'previous_group_id', None)]
+    ))
+
+
+@receiver(bulk_created, sender=Post)
+def bump_posts_pages(sender, objs, **kwargs):
+    cache.bump(*post_scopes(objs))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_pages(sender, instance, **kwargs):
+    cache.bump(
+        cache.comments_scope(instance.post_id),
+        *author_scopes(instance.author_id)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_pages(sender, instance, **kwargs):
+    cache.bump(*author_scopes(instance.user_id, instance.author_id))
+
+
+@receiver(bulk_created, sender=Follow)
+def bump_follows_pages(sender, objs, **kwargs):
+    # Граф не знает, какие из подписок вставлены (ignore_conflicts),
+    # поэтому перестраивается целиком.
+    follow_graph.invalidate()
+    cache.bump(*author_scopes(*{
+        user_id for follow in objs
+        for user_id in (follow.user_id, follow.author_id)
+    }))
+
+
+@receiver(post_save, sender=Follow)
+def add_follow_edge(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_edge(sender, instance, **kwargs):
+    follow_graph.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_pages(sender, instance, **kwargs):
+    cache.bump(cache.GROUPS)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnail(sender, instance, **kwargs):
+    """Миниатюра строится в фоне после фиксации транзакции."""
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, apps=None, **kwargs):
+    """Возвращает триггеры поиска, удаленные пересозданием таблиц."""
+    if sender.name != 'posts':
+        return
+    try:
+        # apps описывает схему после миграций; flush его не передает.
+        if apps is not None:
+            apps.get_model('posts', 'PostIndex')
+    except LookupError:
+        return
+    search.install(connections[using])
+
+
+@receiver(post_save, sender=Post)
+def record_post_trend(sender, instance, created, **kwargs):
+    if created:
+        trending.record(
+            instance.pk, instance.group_id, trending.POST_WEIGHT)
+
+
+@receiver(bulk_created, sender=Post)
+def record_posts_trend(sender, objs, **kwargs):
+    """Записи без pk (SQLite) поднимают только свою группу."""
+    for post in objs:
+        trending.record(post.pk, post.group_id, trending.POST_WEIGHT)
+
+
+@receiver(post_save, sender=Comment)
+def record_comment_trend(sender, instance, created, **kwargs):
+    """Комментарий поднимает запись и ее группу в популярном."""
+    if created:
+        trending.record(
+            instance.post_id, instance.post.group_id,
+            trending.COMMENT_WEIGHT
+        )
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import analytics
+from posts.analytics import HyperLogLog
+from posts.models import Post, PostViews, User
+
+REPORT_URL = reverse('posts:post_views_report')
+
+
+class HyperLogLogTests(TestCase):
+    def test_estimate(self):
+        """Оценка близка к числу различных значений и не растет от
+        повторов."""
+        for count in (10, 5000):
+            with self.subTest(count=count):
+                visitors = HyperLogLog()
+                for _ in range(2):
+                    for i in range(count):
+                        visitors.add(f'visitor {i}')
+                self.assertAlmostEqual(
+                    len(visitors), count, delta=count * 0.1)
+
+    def test_merge(self):
+        """Объединение оценивает объединение множеств."""
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(1000):
+            first.add(f'visitor {i}')
+            second.add(f'visitor {i + 500}')
+        first.merge(bytes(second.registers))
+        self.assertAlmostEqual(len(first), 1500, delta=150)
+
+
+class PostViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        cls.post = Post.objects.create(author=cls.author, text='Запись')
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        # Просмотры могли накопиться в других тестах.
+        analytics.flush()
+        PostViews.objects.all().delete()
+        self.guest = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_views_are_batched(self):
+        """Просмотры, и из кеша страниц тоже, сохраняются пачкой."""
+        for client in (self.guest, self.guest, self.author_client):
+            client.get(self.POST_DETAIL_URL)
+        self.assertFalse(PostViews.objects.exists())
+        analytics.flush()
+        self.assertEqual(analytics.totals(self.post.pk), (3, 2))
+        self.guest.get(self.POST_DETAIL_URL)
+        analytics.flush()
+        self.assertEqual(PostViews.objects.get().views, 4)
+        self.assertEqual(analytics.totals(self.post.pk), (4, 2))
+
+    def test_missing_post_is_not_counted(self):
+        """Ответы 404 не считаются просмотрами."""
+        self.guest.get(reverse('posts:post_detail', args=[0]))
+        analytics.flush()
+        self.assertFalse(PostViews.objects.exists())
+
+    def test_report(self):
+        """Отчет доступен персоналу и показывает сохраненные просмотры."""
+        self.guest.get(self.POST_DETAIL_URL)
+        analytics.flush()
+        response = self.author_client.get(REPORT_URL)
+        self.assertEqual(response.status_code, 302)
+        post, = self.staff_client.get(REPORT_URL).context['posts']
+        self.assertEqual(post, self.post)
+        self.assertEqual((post.view_count, post.visitor_count), (1, 1))
+
+    def test_failed_flush_keeps_views(self):
+        """Просмотры, которые не удалось сохранить, уходят со следующим
+        сбросом."""
+        analytics.record(self.post.pk, 'first')
+        with mock.patch.object(PostViews.objects, 'bulk_create',
+                               side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                analytics.flush()
+        analytics.record(self.post.pk, 'second')
+        analytics.flush()
+        self.assertEqual(analytics.totals(self.post.pk), (2, 2))
+
+    def test_row_created_by_other_process(self):
+        """Строку дня, созданную другим процессом после чтения, сброс
+        перечитывает и дополняет."""
+        other = HyperLogLog()
+        other.add('other')
+        bulk_update = PostViews.objects.bulk_update
+
+        def create_row(rows, fields):
+            if not PostViews.objects.exists():
+                PostViews.objects.create(
+                    post=self.post, day=timezone.localdate(), views=5,
+                    visitors=bytes(other.registers))
+            return bulk_update(rows, fields)
+
+        analytics.record(self.post.pk, 'first')
+        with mock.patch.object(PostViews.objects, 'bulk_update',
+                               side_effect=create_row):
+            analytics.flush()
+        self.assertEqual(analytics.totals(self.post.pk), (6, 2))
@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import get_template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.query_budget import Budget, QueryLog, enforce
+from posts import views
+from posts.models import Comment, Follow, Group, Post, User
+from posts.urls import app_name, urlpatterns
+
+USERNAME_AUTHOR = 'author'
+USERNAME_READER = 'reader'
+GROUP_SLUG = 'group'
+
+INDEX_URL = reverse('posts:index')
+GROUP_URL = reverse('posts:group_list', args=[GROUP_SLUG])
+PROFILE_URL = reverse('posts:profile', args=[USERNAME_AUTHOR])
+SEARCH_URL = reverse('posts:search')
+TRENDING_URL = reverse('posts:trending')
+POST_CREATE_URL = reverse('posts:post_create')
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+SUGGESTIONS_URL = reverse('posts:suggestions')
+PROFILE_FOLLOW_URL = reverse('posts:profile_follow', args=[USERNAME_AUTHOR])
+PROFILE_UNFOLLOW_URL = reverse('posts:profile_unfollow',
+                               args=[USERNAME_AUTHOR])
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=USERNAME_AUTHOR)
+        cls.reader = User.objects.create(username=USERNAME_READER)
+        cls.group = Group.objects.create(
+            title='Группа', slug=GROUP_SLUG, description='Описание')
+        # Страница полная, чтобы N+1 в карточке записи был заметен.
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Запись {i}')
+            for i in range(15)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=f'Комментарий {i}')
+            for i in range(25)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.POST_EDIT_URL = reverse('posts:post_edit', args=[cls.post.pk])
+        cls.COMMENTS_URL = reverse('posts:post_comments', args=[cls.post.pk])
+        cls.ADD_COMMENT_URL = reverse('posts:add_comment', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_every_view_has_budget(self):
+        """У каждой страницы posts объявлен бюджет запросов."""
+        for pattern in urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertTrue(
+                    hasattr(pattern.callback, 'query_budget'),
+                    f'{app_name}:{pattern.name} без бюджета запросов'
+                )
+
+    def test_pages_within_budget(self):
+        """Страницы укладываются в бюджеты и с пустым кешем."""
+        requests = [
+            (self.reader_client, 'get', INDEX_URL, {}),
+            (self.reader_client, 'get', GROUP_URL, {}),
+            (self.reader_client, 'get', PROFILE_URL, {}),
+            (self.reader_client, 'get', SEARCH_URL, {'q': 'запись'}),
+            (self.reader_client, 'get', TRENDING_URL, {}),
+            (self.reader_client, 'get', self.POST_DETAIL_URL, {}),
+            (self.reader_client, 'get', self.COMMENTS_URL, {}),
+            (self.reader_client, 'get', FOLLOW_INDEX_URL, {}),
+            (self.reader_client, 'get', SUGGESTIONS_URL, {}),
+            (self.author_client, 'get', POST_CREATE_URL, {}),
+            (self.author_client, 'get', self.POST_EDIT_URL, {}),
+            (self.author_client, 'post', POST_CREATE_URL,
+             {'text': 'Новая', 'group': self.group.pk}),
+            (self.author_client, 'post', self.POST_EDIT_URL,
+             {'text': 'Правка', 'group': self.group.pk}),
+            (self.reader_client, 'post', self.ADD_COMMENT_URL,
+             {'text': 'Еще'}),
+            (self.reader_client, 'get', PROFILE_UNFOLLOW_URL, {}),
+            (self.reader_client, 'get', PROFILE_FOLLOW_URL, {}),
+        ]
+        for client, method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                cache.clear()
+                with enforce() as violations:
+                    getattr(client, method)(url, data)
+                self.assertEqual(violations, [], '\n'.join(violations))
+
+    def test_violation_report(self):
+        """Превышение описывается запросами по местам вызова."""
+        with mock.patch.object(views.index, 'query_budget', Budget(0, 0)):
+            with enforce() as violations:
+                self.reader_client.get(INDEX_URL)
+        report, = violations
+        self.assertIn(f'{INDEX_URL} (posts:index)', report)
+        self.assertIn('запросов при бюджете 0', report)
+        self.assertIn('core/paginator.py', report)
+        self.assertIn('FROM "posts_post"', report)
+
+    def test_template_call_site(self):
+        """Запросы из шаблона привязываются к его строке."""
+        log = QueryLog()
+        post = Post.objects.get(pk=self.post.pk)
+        with connection.execute_wrapper(log):
+            get_template('posts/includes/post.html').render({'post': post})
+        self.assertTrue(log.queries)
+        for query in log.queries:
+            self.assertRegex(query.site, r'^posts/includes/post\.html:\d+$')
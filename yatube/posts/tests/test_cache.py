@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from posts.cache import Entry, bump, cache_page_versioned, page_key
+
+SCOPE = 'test'
+URL = '/cached/'
+
+
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @cache_page_versioned(lambda request: [SCOPE], soft_ttl=60, beta=0)
+        def view(request):
+            self.calls += 1
+            return HttpResponse(str(self.calls))
+
+        self.view = view
+
+    def get(self):
+        request = RequestFactory().get(URL)
+        request.user = AnonymousUser()
+        return self.view(request).content
+
+    def test_fresh_entry_is_reused(self):
+        """Свежая запись отдается без вызова view."""
+        self.assertEqual(self.get(), b'1')
+        self.assertEqual(self.get(), b'1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_entry_served_while_locked(self):
+        """Пока другой процесс пересобирает страницу, отдается старая."""
+        self.get()
+        bump(SCOPE)
+        request = RequestFactory().get(URL)
+        request.user = AnonymousUser()
+        cache.add(f'{page_key(request)}:lock', 1)
+        self.assertEqual(self.get(), b'1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_entry_regenerated_by_lock_owner(self):
+        """Процесс, взявший блокировку, пересобирает страницу."""
+        self.get()
+        bump(SCOPE)
+        self.assertEqual(self.get(), b'2')
+        self.assertEqual(self.get(), b'2')
+
+    def test_soft_ttl_and_early_expiration(self):
+        """После мягкого срока и при раннем истечении запись устарела."""
+        now = time.time()
+        expired = Entry(None, [1], now - 1, delta=0)
+        self.assertFalse(expired.is_fresh([1], beta=0))
+        slow = Entry(None, [1], now + 1, delta=10 ** 6)
+        self.assertTrue(slow.is_fresh([1], beta=0))
+        self.assertFalse(slow.is_fresh([1], beta=1))
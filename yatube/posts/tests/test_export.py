@@ -0,0 +1,84 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+ADMIN_POSTS_URL = reverse('admin:posts_post_changelist')
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Запись, "{i}"')
+            for i in range(5)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, kind, name):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, name)
+        call_command('export_yatube', kind, path, chunk_size=2,
+                     stderr=StringIO())
+        return path
+
+    def test_export_jsonl_gzip(self):
+        """Все записи выгружаются пачками в сжатый JSONL."""
+        with gzip.open(self.export('posts', 'posts.jsonl.gz'), 'rt') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            sorted(Post.objects.values_list('pk', flat=True))
+        )
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['group'], 'group')
+
+    def test_export_csv_imports_back(self):
+        """CSV выгрузки подписок и комментариев читает import_yatube."""
+        with open(self.export('comments', 'comments.csv'),
+                  encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]['post'], str(self.post.pk))
+        self.assertEqual(rows[0]['text'], 'Комментарий')
+        path = self.export('follows', 'follows.csv')
+        Follow.objects.all().delete()
+        call_command('import_yatube', 'follows', path, stdout=StringIO())
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+
+    def test_admin_action(self):
+        """Действие админки отдает выбранные записи потоком."""
+        admin = Client()
+        admin.force_login(User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+        selected = list(Post.objects.values_list('pk', flat=True)[:2])
+        response = admin.post(ADMIN_POSTS_URL, {
+            'action': 'export_jsonl',
+            '_selected_action': selected,
+        })
+        self.assertTrue(response.streaming)
+        rows = gzip.decompress(
+            b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(
+            sorted(json.loads(row)['id'] for row in rows), sorted(selected)
+        )
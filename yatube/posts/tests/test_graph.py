@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.graph import FollowGraph, follow_graph
+from posts.models import Follow, Post, ProfileStats, TimelineEntry, User
+
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+SUGGESTIONS_URL = reverse('posts:suggestions')
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.friend, cls.other, cls.star, cls.loner = (
+            User.objects.create(username=name)
+            for name in ('reader', 'friend', 'other', 'star', 'loner')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def follow(self, user, *authors):
+        for author in authors:
+            Follow.objects.create(user=user, author=author)
+
+    def test_follow_and_unfollow(self):
+        """Подписки и отписки сразу видны в графе."""
+        self.follow(self.reader, self.friend)
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.friend.pk))
+        self.assertEqual(follow_graph.followers_count(self.friend.pk), 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.friend.pk))
+        self.assertEqual(follow_graph.followers_count(self.friend.pk), 0)
+
+    def test_suggestions(self):
+        """Сначала авторы ваших авторов, затем популярные."""
+        self.follow(self.reader, self.friend, self.other)
+        self.follow(self.friend, self.star, self.loner)
+        self.follow(self.other, self.star)
+        self.follow(self.loner, self.reader)
+        self.assertEqual(
+            follow_graph.suggestions(self.reader.pk, 5),
+            [self.star.pk, self.loner.pk]
+        )
+        self.assertEqual(
+            follow_graph.suggestions(self.star.pk, 2),
+            [self.reader.pk, self.friend.pk]
+        )
+
+    def test_other_process_catches_up(self):
+        """Другой процесс применяет изменения из кеша, а после потери
+        кеша перестраивает граф из базы."""
+        other = FollowGraph()
+        self.assertEqual(other.following(self.reader.pk), [])
+        self.follow(self.reader, self.friend, self.star)
+        self.assertEqual(
+            other.following(self.reader.pk), [self.friend.pk, self.star.pk])
+        Follow.objects.filter(author=self.star).delete()
+        cache.clear()
+        self.assertEqual(other.following(self.reader.pk), [self.friend.pk])
+
+    def test_pages_show_suggested_authors(self):
+        """Рекомендации выводятся в ленте подписок и во фрагменте,
+        который подгружает профиль."""
+        self.follow(self.reader, self.friend)
+        self.follow(self.friend, self.star)
+        client = Client()
+        client.force_login(self.reader)
+        for url in (FOLLOW_INDEX_URL, SUGGESTIONS_URL):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(
+                    response.context['suggested_authors'], [self.star])
+                self.assertContains(response, 'Рекомендуемые авторы')
+        self.assertContains(
+            client.get(reverse('posts:profile', args=[self.friend.username])),
+            SUGGESTIONS_URL
+        )
+
+    def test_suggestions_not_cached_with_profile(self):
+        """Подписка чужого автора видна в рекомендациях, пока профиль
+        в кеше."""
+        self.follow(self.reader, self.friend)
+        client = Client()
+        client.force_login(self.reader)
+        profile_url = reverse('posts:profile', args=[self.other.username])
+        cached = client.get(profile_url).content
+        self.assertNotContains(client.get(SUGGESTIONS_URL), 'star')
+        self.follow(self.friend, self.star)
+        self.assertEqual(client.get(profile_url).content, cached)
+        self.assertContains(client.get(SUGGESTIONS_URL), 'star')
+
+    def test_bulk_created_follows(self):
+        """Массовая вставка подписок перестраивает граф, дополняет
+        ленты и пересчитывает счетчики профилей."""
+        post = Post.objects.create(author=self.friend, text='Запись')
+        self.assertEqual(follow_graph.following(self.reader.pk), [])
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.friend)])
+        self.assertEqual(
+            follow_graph.following(self.reader.pk), [self.friend.pk])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.friend).followers_count, 1)
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.reader).follows_count, 1)
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import cache
+from posts.graph import follow_graph
+from posts.models import Comment, Follow, Group, Post, ProfileStats, User
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_yatube', *args, batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_import_posts_jsonl(self):
+        """Записи импортируются пачками с датами, группами и id."""
+        rows = [
+            {'id': 100, 'author': 'author', 'group': 'group',
+             'text': 'Первая', 'pub_date': '2020-01-01T10:00:00'},
+            {'author': 'author', 'text': 'Вторая'},
+            {'author': 'nobody', 'text': 'Без автора'},
+            {'author': 'author', 'group': 'missing', 'text': 'Без группы'},
+        ]
+        path = self.write('.jsonl', '\n'.join(map(json.dumps, rows)))
+        self.assertIn(
+            'Импортировано: 2, пропущено: 2', self.run_import('posts', path)
+        )
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(
+            ProfileStats.objects.for_user(self.author).posts_count, 2
+        )
+        # Повторно пропускаются записи с уже занятыми id.
+        self.assertIn(
+            'Импортировано: 1, пропущено: 3', self.run_import('posts', path)
+        )
+
+    def test_import_comments_and_follows_csv(self):
+        """Комментарии и подписки импортируются из CSV."""
+        post = Post.objects.create(author=self.author, text='Запись')
+        comments = self.write(
+            '.csv',
+            'post,author,text\n'
+            f'{post.pk},reader,Комментарий\n'
+            '0,reader,К несуществующей записи\n'
+        )
+        self.assertIn(
+            'Импортировано: 1, пропущено: 1',
+            self.run_import('comments', comments)
+        )
+        self.assertTrue(Comment.objects.filter(post=post).exists())
+        self.assertEqual(
+            ProfileStats.objects.for_user(self.reader).comments_count, 1)
+        follows = self.write(
+            '.csv',
+            'user,author\nreader,author\nreader,author\nnew,author\n'
+        )
+        # Граф уже построен и должен узнать о массовой загрузке.
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk))
+        bystander = User.objects.create(username='bystander')
+        scopes = [cache.author_scope('author'),
+                  cache.author_scope('bystander')]
+        versions = cache.get_versions(scopes)
+        out = StringIO()
+        call_command('import_yatube', 'follows', follows,
+                     create_users=True, stdout=out)
+        # Страницы обновляются только у участников подписок.
+        author_version, bystander_version = cache.get_versions(scopes)
+        self.assertNotEqual(author_version, versions[0])
+        self.assertEqual(bystander_version, versions[1])
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.author).followers_count, 2)
+        self.assertEqual(
+            ProfileStats.objects.get(user=bystander).followers_count, 0)
+        self.assertIn('Импортировано: 2, пропущено: 1', out.getvalue())
+        self.assertEqual(
+            Follow.objects.filter(author=self.author).count(), 2
+        )
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.author.pk))
+        self.assertTrue(
+            self.reader.timeline.filter(post=post).exists()
+        )
+        self.assertFalse(
+            User.objects.get(username='new').has_usable_password()
+        )
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.slow_queries import explain
+from posts.models import Comment, Follow, Group, Post, User
+
+USERNAME_AUTHOR = 'author'
+USERNAME_READER = 'reader'
+GROUP_SLUG = 'group'
+
+INDEX_URL = reverse('posts:index')
+GROUP_URL = reverse('posts:group_list', args=[GROUP_SLUG])
+PROFILE_URL = reverse('posts:profile', args=[USERNAME_AUTHOR])
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class IndexUsageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=USERNAME_AUTHOR)
+        cls.reader = User.objects.create(username=USERNAME_READER)
+        cls.group = Group.objects.create(
+            title='Группа', slug=GROUP_SLUG, description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Запись {i}')
+            for i in range(15)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=f'Комментарий {i}')
+            for i in range(25)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.COMMENTS_URL = reverse('posts:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url):
+        """Планы запросов страницы и следующей за ней, у которых есть
+        ORDER BY."""
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+            cursor = getattr(
+                response.context and response.context.get('page_obj'),
+                'next_cursor', None)
+            if cursor:
+                self.client.get(url, {'after': cursor})
+        return [
+            (sql, explain(connection, sql, params))
+            for sql, params in queries
+            if sql.startswith('SELECT') and 'ORDER BY' in sql
+        ]
+
+    def test_list_queries_use_index_order(self):
+        """Списки страниц идут по индексу, без сортировки в B-дереве."""
+        for url in (INDEX_URL, GROUP_URL, PROFILE_URL, FOLLOW_INDEX_URL,
+                    self.POST_DETAIL_URL, self.COMMENTS_URL):
+            with self.subTest(url=url):
+                plans = self.plans(url)
+                self.assertTrue(plans)
+                for sql, plan in plans:
+                    self.assertNotIn(TEMP_SORT, plan, f'{sql}\n{plan}')
+
+    def test_follow_lookup_uses_index(self):
+        """Проверка подписки и подписчики автора ищутся по индексу."""
+        for queryset in (
+            Follow.objects.filter(author=self.author, user=self.reader),
+            Follow.objects.filter(author=self.author).values('user'),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                self.assertRegex(queryset.explain(), r'SEARCH .* INDEX')
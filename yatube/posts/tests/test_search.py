@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+SEARCH_URL = reverse('posts:search')
+ADMIN_POSTS_URL = reverse('admin:posts_post_changelist')
+ADMIN_COMMENTS_URL = reverse('admin:posts_comment_changelist')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Котики котики и собачки')
+        cls.cat = Post.objects.create(
+            author=cls.author, text='Один котик на крыше')
+        cls.dog = Post.objects.create(author=cls.author, text='Собачки')
+        cls.comment = Comment.objects.create(
+            post=cls.dog, author=cls.author, text='Хорошие собачки')
+        cls.guest = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        return self.guest.get(
+            SEARCH_URL, {'q': query, **params}).context['page_obj']
+
+    def test_search_ranks_posts(self):
+        """Поиск находит записи по префиксу слова, лучшие первыми."""
+        self.assertEqual(list(self.search('КОТИК')), [self.cats, self.cat])
+        self.assertEqual(list(self.search('котик крыше')), [self.cat])
+
+    def test_index_follows_changes(self):
+        """Индекс следует за bulk_create, update и delete."""
+        Post.objects.bulk_create([Post(author=self.author, text='Попугаи')])
+        new = Post.objects.get(text='Попугаи')
+        self.assertEqual(list(Post.objects.search('попугаи')), [new])
+        Post.objects.filter(pk=new.pk).update(text='Хомяки')
+        self.assertFalse(Post.objects.search('попугаи').exists())
+        self.assertEqual(list(Post.objects.search('хомяки')), [new])
+        new.delete()
+        self.assertFalse(Post.objects.search('хомяки').exists())
+
+    def test_syntax_in_query(self):
+        """Символы синтаксиса FTS5 в запросе не ломают поиск."""
+        for query in ['"котик', 'котик OR NOT', '*', 'NEAR(', '']:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.guest.get(SEARCH_URL, {'q': query}).status_code, 200
+                )
+
+    def test_cursor_pagination(self):
+        """Результаты листаются курсором, запрос сохраняется в ссылках."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Котик номер {i}')
+            for i in range(12)
+        )
+        first = self.search('котик')
+        self.assertEqual(len(first), 10)
+        self.assertIn(
+            f'?q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA&after={first.next_cursor}',
+            self.guest.get(SEARCH_URL, {'q': 'котик'}).content.decode()
+        )
+        second = self.search('котик', after=first.next_cursor)
+        self.assertEqual(len(second), 4)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(
+            list(self.search('котик', before=second.previous_cursor)),
+            list(first)
+        )
+
+    def test_search_finds_posts_by_comments(self):
+        """Запись находится и по тексту своих комментариев, а
+        совпадение в комментарии поднимает ее выше."""
+        self.assertEqual(list(self.search('хорошие')), [self.dog])
+        self.assertEqual(
+            list(self.search('собачки')), [self.dog, self.cats])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по индексу."""
+        admin = Client()
+        admin.force_login(User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+        for url, query, expected in [
+            (ADMIN_POSTS_URL, 'котик', {self.cats, self.cat}),
+            (ADMIN_COMMENTS_URL, 'хорошие', {self.comment}),
+        ]:
+            with self.subTest(url=url):
+                response = admin.get(url, {'q': query})
+                self.assertEqual(
+                    set(response.context['cl'].result_list), expected)
@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.cache import author_scope, get_versions
+from posts.models import Comment, Follow, Post, ProfileStats, User
+
+USERNAME_READER = 'reader'
+USERNAME_AUTHOR = 'author'
+
+PROFILE_URL = reverse('posts:profile', args=[USERNAME_AUTHOR])
+PROFILE_FOLLOW_URL = reverse('posts:profile_follow', args=[USERNAME_AUTHOR])
+PROFILE_UNFOLLOW_URL = reverse('posts:profile_unfollow',
+                               args=[USERNAME_AUTHOR])
+
+
+class ProfileStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username=USERNAME_READER)
+        cls.author = User.objects.create(username=USERNAME_AUTHOR)
+        cls.post = Post.objects.create(author=cls.author, text='a' * 20)
+        Comment.objects.create(post=cls.post, author=cls.author, text='b')
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+
+    def stats(self, user):
+        return ProfileStats.objects.values(
+            'posts_count', 'comments_count',
+            'follows_count', 'followers_count'
+        ).get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счетчики меняются вместе с записями и подписками."""
+        self.client_reader.get(PROFILE_FOLLOW_URL)
+        self.assertEqual(self.stats(self.author), {
+            'posts_count': 1, 'comments_count': 1,
+            'follows_count': 0, 'followers_count': 1,
+        })
+        self.assertEqual(self.stats(self.reader)['follows_count'], 1)
+        self.client_reader.get(PROFILE_UNFOLLOW_URL)
+        self.post.delete()
+        self.assertEqual(self.stats(self.author), {
+            'posts_count': 0, 'comments_count': 0,
+            'follows_count': 0, 'followers_count': 0,
+        })
+
+    def test_profile_reads_stats(self):
+        """Профиль берет счетчики из строки статистики."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        stats = self.client_reader.get(PROFILE_URL).context['stats']
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_profile_stats исправляет расхождения."""
+        ProfileStats.objects.filter(user=self.author).update(posts_count=7)
+        ProfileStats.objects.filter(user=self.reader).delete()
+        scope = [author_scope(USERNAME_AUTHOR)]
+        version = get_versions(scope)
+        call_command('reconcile_profile_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author)['posts_count'], 1)
+        self.assertEqual(self.stats(self.reader)['posts_count'], 0)
+        self.assertNotEqual(get_versions(scope), version)
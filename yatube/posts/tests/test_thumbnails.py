@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TransactionTestCase):
+    def setUp(self):
+        # Фоновый пул строил бы те же миниатюры одновременно с тестом.
+        patcher = mock.patch.object(thumbnails, 'schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.post = Post.objects.create(
+            author=User.objects.create(username='author'),
+            text='a' * 20,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate(self):
+        """Миниатюра строится с параметрами шаблонного тега."""
+        thumbnail = thumbnails.generate(self.post.image.name)
+        self.assertTrue(thumbnail.exists())
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+    def test_generate_missing_image(self):
+        """Отсутствующая картинка не роняет построение."""
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            self.assertIsNone(thumbnails.generate('posts/missing.gif'))
+
+    def test_backfill_command(self):
+        """Команда строит миниатюры всех записей с картинками."""
+        Post.objects.create(author=self.post.author, text='без картинки')
+        out = StringIO()
+        call_command('backfill_thumbnails', workers=2, stdout=out)
+        self.assertIn('Миниатюр готово: 1, ошибок: 0', out.getvalue())
@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.cache import author_scope, get_versions
+from posts.models import Follow, Post, TimelineEntry, User
+
+USERNAME_READER = 'reader'
+USERNAME_AUTHOR = 'author'
+
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+PROFILE_FOLLOW_URL = reverse('posts:profile_follow', args=[USERNAME_AUTHOR])
+PROFILE_UNFOLLOW_URL = reverse('posts:profile_unfollow',
+                               args=[USERNAME_AUTHOR])
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username=USERNAME_READER)
+        cls.author = User.objects.create(username=USERNAME_AUTHOR)
+        cls.post = Post.objects.create(author=cls.author, text='a' * 20)
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+
+    def timeline(self):
+        return list(
+            TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post_id', flat=True)
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные записи."""
+        self.client_reader.get(PROFILE_FOLLOW_URL)
+        self.assertEqual(self.timeline(), [self.post.id])
+
+    def test_new_post_fans_out(self):
+        """Новая запись попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='b' * 20)
+        self.assertEqual(self.timeline(), [post.id, self.post.id])
+        self.assertEqual(
+            list(self.client_reader.get(FOLLOW_INDEX_URL).context['page_obj']),
+            [post, self.post]
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает записи автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client_reader.get(PROFILE_UNFOLLOW_URL)
+        self.assertEqual(self.timeline(), [])
+
+    def test_rebuild_timelines(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        scope = [author_scope(USERNAME_READER)]
+        version = get_versions(scope)
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(), [self.post.id])
+        self.assertNotEqual(get_versions(scope), version)
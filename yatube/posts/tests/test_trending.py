@@ -0,0 +1,86 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Group, GroupTrend, Post, PostTrend, User
+
+INDEX_URL = reverse('posts:index')
+TRENDING_URL = reverse('posts:trending')
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.quiet = Group.objects.create(
+            title='Тихая', slug='quiet', description='Описание')
+        cls.busy = Group.objects.create(
+            title='Шумная', slug='busy', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        # Счетчики процесса могли накопиться в других тестах.
+        trending.flush()
+        PostTrend.objects.all().delete()
+        GroupTrend.objects.all().delete()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.author, text='Да')
+
+    def test_recent_activity_outranks_old(self):
+        """Давняя активность затухает и уступает недавней."""
+        old = Post.objects.create(author=self.author, text='Старая')
+        new = Post.objects.create(author=self.author, text='Новая')
+        half_lives_ago = time.time() - 2 * settings.TRENDING_HALF_LIFE
+        with mock.patch.object(trending.time, 'time',
+                               return_value=half_lives_ago):
+            self.comment(old, 3)
+        self.comment(new)
+        trending.flush()
+        old_top, new_top = sorted(
+            trending.top_posts(2), key=lambda post: post.pk)
+        self.assertEqual(trending.top_posts(2), [new_top, old_top])
+        self.assertAlmostEqual(old_top.trend_score, 2 + 3 / 4, places=3)
+        self.assertAlmostEqual(new_top.trend_score, 2 + 1, places=3)
+
+    def test_flush_adds_to_saved_counters(self):
+        """Сброс прибавляет к сохраненным счетчикам записи и группы."""
+        post = Post.objects.create(
+            author=self.author, group=self.busy, text='Запись')
+        Post.objects.create(author=self.author, group=self.quiet, text='Еще')
+        trending.flush()
+        self.comment(post, 2)
+        trending.flush()
+        self.assertEqual(trending.top_groups(2), [self.busy, self.quiet])
+        self.assertAlmostEqual(
+            trending.top_groups(1)[0].trend_score, 4, places=3)
+        self.assertAlmostEqual(
+            PostTrend.objects.get(pk=post.pk).rank,
+            trending.now_rank() + 2, places=3
+        )
+
+    def test_deleted_post_is_skipped(self):
+        """Запись, удаленная до сброса, в популярное не попадает."""
+        post = Post.objects.create(author=self.author, text='Удалю')
+        post.delete()
+        trending.flush()
+        self.assertFalse(PostTrend.objects.exists())
+
+    def test_pages(self):
+        """Популярное есть на своей странице и в блоке на главной."""
+        post = Post.objects.create(
+            author=self.author, group=self.busy, text='Запись')
+        trending.flush()
+        client = Client()
+        response = client.get(TRENDING_URL)
+        self.assertEqual(response.context['posts'], [post])
+        self.assertEqual(response.context['groups'], [self.busy])
+        trending_block = client.get(INDEX_URL).context['trending']
+        self.assertEqual(trending_block['posts'], [post])
+        self.assertEqual(trending_block['groups'], [self.busy])
@@ -5,10 +5,12 @@ from django.contrib import auth
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post, User
+from posts.models import Comment, Follow, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -73,6 +75,7 @@ class PostViewsTests(TestCase):
             author=cls.author
         )
         cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.id])
+        cls.COMMENTS_URL = reverse('posts:post_comments', args=[cls.post.id])
         cls.guest = Client()
         cls.another = Client()
         cls.another.force_login(cls.user)
@@ -143,17 +146,40 @@ class PostViewsTests(TestCase):
             self.author)
 
     def test_cache_index_page(self):
-        """Проверка работы кеша"""
-        content_before = self.another.get(INDEX_URL).content
+        """Главная берется из кеша, пока записи не меняются."""
+        content_before = self.guest.get(INDEX_URL).content
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо сигналов')
+        self.assertEqual(content_before, self.guest.get(INDEX_URL).content)
         Post.objects.all().delete()
-        content_after = self.authorized_client.get(INDEX_URL).content
-        self.assertEqual(content_before, content_after)
-        cache.clear()
         self.assertNotEqual(
             content_before,
-            self.authorized_client.get(INDEX_URL).content
+            self.guest.get(INDEX_URL).content
         )
 
+    def rename_group(self):
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+
+    def test_cache_invalidated_by_changes(self):
+        """Кеш страниц сбрасывается изменениями их содержимого."""
+        cases = [
+            [self.COMMENTS_URL, lambda: self.post.comments.create(
+                author=self.user, text='Новый комментарий')],
+            [PROFILE_URL, lambda: Follow.objects.create(
+                user=self.user_2, author=self.author)],
+            [GROUP_URL_2, lambda: Post.objects.create(
+                author=self.author, group=self.group_2, text='Вторая')],
+            [GROUP_URL, self.rename_group],
+        ]
+        for url, change in cases:
+            with self.subTest(url=url):
+                content_before = self.guest.get(url).content
+                change()
+                self.assertNotEqual(
+                    content_before, self.guest.get(url).content
+                )
+
     def test_follow_base(self):
         """Проверка базы после запроса подписаться."""
         Follow.objects.all().delete()
@@ -205,3 +231,71 @@ class PostViewsTests(TestCase):
                 self.assertEqual(
                     len(self.another.get(url).context['page_obj']),
                     count)
+
+    def test_cursor_paginator(self):
+        """Курсорные ссылки ведут на соседние страницы."""
+        Post.objects.all().delete()
+        Post.objects.bulk_create(
+            Post(
+                author=self.author,
+                text=f'Тестовый пост {i}',
+                group=self.group) for i in range(
+                settings.NUM_POSTS_PER_PAGE + RESULT_FOR_SECOND_PAGE)
+        )
+        for url in (INDEX_URL, GROUP_URL, PROFILE_URL, FOLLOW_INDEX_URL):
+            with self.subTest(url=url):
+                cache.clear()
+                first = self.another.get(url).context['page_obj']
+                self.assertFalse(first.has_previous())
+                second = self.another.get(
+                    f'{url}?after={first.next_cursor}'
+                ).context['page_obj']
+                self.assertEqual(len(second), RESULT_FOR_SECOND_PAGE)
+                self.assertFalse(second.has_next())
+                back = self.another.get(
+                    f'{url}?before={second.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_queries_do_not_grow_with_page(self):
+        """Число запросов страницы не зависит от числа записей."""
+        urls = [INDEX_URL, GROUP_URL, PROFILE_URL, FOLLOW_INDEX_URL,
+                self.POST_DETAIL_URL]
+        counts = {}
+        for url in urls:
+            # Первый показ строит миниатюру картинки, его не считаем.
+            self.another.get(url)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.another.get(url)
+            counts[url] = len(queries)
+        for i in range(3):
+            user = User.objects.create(username=f'commenter_{i}')
+            Post.objects.create(author=self.author, text=f'Текст {i}',
+                                group=self.group)
+            self.post.comments.create(author=user, text=f'Комментарий {i}')
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.another.get(url)
+                self.assertEqual(len(queries), counts[url])
+
+    def test_comments_fragment_pages(self):
+        """Фрагмент комментариев отдает их порциями."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Комментарий {i}')
+            for i in range(settings.NUM_COMMENTS_PER_PAGE + 1)
+        )
+        first = self.guest.get(self.COMMENTS_URL).context['page_obj']
+        self.assertEqual(len(first), settings.NUM_COMMENTS_PER_PAGE)
+        second = self.guest.get(
+            f'{self.COMMENTS_URL}?after={first.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(len(second), 1)
+
+    def test_comments_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующей записи — 404."""
+        url = reverse('posts:post_comments', args=[0])
+        for _ in range(2):
+            self.assertEqual(self.guest.get(url).status_code, 404)
@@ -0,0 +1,74 @@
+"""Построение миниатюр картинок записей вне запроса.
+
+Тег {% thumbnail %} строит миниатюру при первом показе, и за
+декодирование и кадрирование платит первый посетитель. Здесь та же
+миниатюра строится сразу после сохранения записи в небольшом пуле
+потоков; тег потом находит ее в хранилище sorl.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail import get_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# Должны совпадать с параметрами тега {% thumbnail %} в шаблонах записей.
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def generate(name):
+    """Строит миниатюру картинки name, возвращает ее или None."""
+    try:
+        thumbnail = get_thumbnail(name, GEOMETRY, **OPTIONS)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+        return None
+    # Ошибку чтения исходника sorl только пишет в лог и возвращает
+    # миниатюру, которой нет в хранилище.
+    if not thumbnail.exists():
+        logger.error('Не удалось построить миниатюру %s', name)
+        return None
+    return thumbnail
+
+
+def run(name):
+    """generate для рабочего потока: соединения с БД потока закрываются."""
+    try:
+        return generate(name)
+    finally:
+        connections.close_all()
+
+
+def _run_scheduled(name):
+    try:
+        run(name)
+    finally:
+        _slots.release()
+
+
+def schedule(name):
+    """Ставит миниатюру в очередь, не задерживая запрос.
+
+    Очередь ограничена THUMBNAIL_QUEUE_SIZE: если она полна, миниатюру
+    построит тег при первом показе. Возвращает, поставлена ли задача.
+    """
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _slots = threading.BoundedSemaphore(settings.THUMBNAIL_QUEUE_SIZE)
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    if not _slots.acquire(blocking=False):
+        return False
+    _executor.submit(_run_scheduled, name)
+    return True
@@ -0,0 +1,122 @@
+"""Популярные записи и группы по недавней активности.
+
+Новая запись и комментарий добавляют вес записи и ее группе. Вклад
+события затухает вдвое за TRENDING_HALF_LIFE секунд. Чтобы не пересчитывать
+все счетчики со временем, вклад события в момент t хранится приведенным
+к общему началу отсчета: вес * 2 ** (t / half_life). Тогда порядок
+счетчиков от времени не зависит, а текущее значение получается делением
+на 2 ** (now / half_life). Значения растут экспоненциально, поэтому
+хранится их log2 (поле rank) и складываются они в логарифмах.
+
+Процесс копит события в памяти, по одному числу на запись или группу,
+и раз в TRENDING_FLUSH_INTERVAL секунд фоновый поток (core.batching)
+прибавляет их к строкам PostTrend и GroupTrend. Страницы читают первые
+строки по индексу rank и не группируют Post и Comment. Два процесса,
+одновременно сбросившие одну запись, могут потерять вклад одного из
+них: рейтинг приблизителен.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from core.batching import Batch
+
+from .models import Group, GroupTrend, Post, PostTrend
+
+POST_WEIGHT = 2
+COMMENT_WEIGHT = 1
+# Строки, затухшие сильнее чем в 2 ** PRUNE_HALF_LIVES раз, удаляются.
+PRUNE_HALF_LIVES = 20
+
+TRENDS = (
+    # Модель счетчика, модель объекта и поле связи.
+    (PostTrend, Post, 'post_id'),
+    (GroupTrend, Group, 'group_id'),
+)
+
+
+def now_rank():
+    """log2 множителя приведения для текущего момента."""
+    return time.time() / settings.TRENDING_HALF_LIFE
+
+
+def log_add(a, b):
+    """log2(2 ** a + 2 ** b) без переполнения."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def record(post_id, group_id, weight):
+    """Добавляет вес записи и ее группе."""
+    rank = math.log2(weight) + now_rank()
+    for key in ((PostTrend, post_id), (GroupTrend, group_id)):
+        if key[1] is not None:
+            batch.update(key, lambda saved: log_add(saved, rank))
+
+
+def save(pending):
+    """Прибавляет пачку {(модель счетчика, pk): rank} к строкам."""
+    # Пачка сохраняется целиком или, при ошибке, возвращается в буфер.
+    with transaction.atomic():
+        for trend, model, field in TRENDS:
+            ranks = {
+                pk: rank for (kind, pk), rank in pending.items()
+                if kind is trend
+            }
+            if ranks:
+                _merge(trend, model, field, ranks)
+            trend.objects.filter(
+                rank__lt=now_rank() - PRUNE_HALF_LIVES).delete()
+
+
+def _merge(trend, model, field, ranks):
+    existing = dict(
+        trend.objects.filter(pk__in=ranks).values_list('pk', 'rank'))
+    trend.objects.bulk_update([
+        trend(**{field: pk}, rank=log_add(rank, ranks[pk]))
+        for pk, rank in existing.items()
+    ], ['rank'])
+    # Объект мог быть удален, пока событие ждало сброса.
+    alive = model.objects.filter(
+        pk__in=ranks.keys() - existing.keys()
+    ).values_list('pk', flat=True)
+    trend.objects.bulk_create(
+        [trend(**{field: pk}, rank=ranks[pk]) for pk in alive],
+        ignore_conflicts=True
+    )
+
+
+batch = Batch('trending', save, log_add, 'TRENDING_FLUSH_INTERVAL')
+
+
+def flush():
+    """Прибавляет накопленное процессом к строкам в базе."""
+    batch.flush()
+
+
+def score(rank):
+    """Текущее значение счетчика по rank."""
+    return 2 ** (rank - now_rank())
+
+
+def top_posts(limit):
+    trends = PostTrend.objects.select_related(
+        'post__author', 'post__group')[:limit]
+    posts = []
+    for trend in trends:
+        trend.post.trend_score = score(trend.rank)
+        posts.append(trend.post)
+    return posts
+
+
+def top_groups(limit):
+    trends = GroupTrend.objects.select_related('group')[:limit]
+    groups = []
+    for trend in trends:
+        trend.group.trend_score = score(trend.rank)
+        groups.append(trend.group)
+    return groups
@@ -14,7 +14,16 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('search/', views.search, name='search'),
+    path('trending/', views.trending, name='trending'),
+    path('analytics/', views.post_views_report, name='post_views_report'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('suggestions/', views.suggestions, name='suggestions'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,64 +1,190 @@
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.db.models import F
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.cache import cache_page
 
+from core.paginator import CursorPaginator, ScoreCursorPaginator
+from core.query_budget import query_budget
+from core.ratelimit import rate_limit
+
+from . import analytics
+from .cache import (GLOBAL, GROUPS, author_scope, cache_page_versioned,
+                    comments_scope, group_scope, post_scope)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .graph import follow_graph
+from .models import Comment, Follow, Group, Post, ProfileStats, User
+from .trending import top_groups, top_posts
+
+
+def get_page_context(queryset, request, keys=CursorPaginator.KEYS):
+    return CursorPaginator(
+        queryset, settings.NUM_POSTS_PER_PAGE, keys).get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'))
+
+
+def suggested_authors(user):
+    """Авторы, на которых стоит подписаться, по графу подписок."""
+    if not user.is_authenticated:
+        return []
+    ids = follow_graph.suggestions(user.pk, settings.NUM_SUGGESTED_AUTHORS)
+    authors = User.objects.in_bulk(ids)
+    return [authors[pk] for pk in ids if pk in authors]
+
+
+def post_author(post_id):
+    """Имя автора записи; оно не меняется, поэтому хранится в кеше."""
+    return cache.get_or_set(
+        f'posts:author:{post_id}',
+        lambda: Post.objects.filter(pk=post_id).values_list(
+            'author__username', flat=True).first(),
+        None
+    )
 
 
-def get_page_context(queryset, request):
-    return Paginator(
-        queryset, settings.NUM_POSTS_PER_PAGE).get_page(
-        request.GET.get('page'))
+def trending_block():
+    """Популярные записи и группы для главной; живут в кеше."""
+    return cache.get_or_set(
+        'posts:trending',
+        lambda: {
+            'posts': top_posts(settings.NUM_TRENDING_POSTS),
+            'groups': top_groups(settings.NUM_TRENDING_GROUPS),
+        },
+        settings.TRENDING_CACHE_TIMEOUT
+    )
 
 
-@cache_page(20, key_prefix='index_page')
+# Два запроса из бюджета — блок популярного при промахе его кеша.
+@query_budget(6, time_ms=50)
+@cache_page_versioned(
+    lambda request: [GLOBAL, GROUPS],
+    soft_ttl=settings.PAGE_CACHE_SOFT_TTL
+)
 def index(request):
     """Выводит шаблон главной страницы"""
     return render(
         request, 'posts/index.html',
-        {'page_obj': get_page_context(Post.objects.all(), request)},
+        {'page_obj': get_page_context(
+            Post.objects.with_related(), request),
+         'trending': trending_block()},
         content_type='text/html', status=200
     )
 
 
+@query_budget(4, time_ms=50)
+@cache_page_versioned(
+    lambda request: [GLOBAL, GROUPS],
+    soft_ttl=settings.PAGE_CACHE_SOFT_TTL
+)
+def trending(request):
+    """Выводит записи и группы с наибольшей недавней активностью"""
+    return render(request, 'posts/trending.html', {
+        'posts': top_posts(settings.NUM_TRENDING_POSTS),
+        'groups': top_groups(settings.NUM_TRENDING_GROUPS),
+    })
+
+
+@query_budget(5, time_ms=50)
+@cache_page_versioned(
+    lambda request, slug: [group_scope(slug), GROUPS],
+    soft_ttl=settings.PAGE_CACHE_SOFT_TTL
+)
 def group_posts(request, slug):
     """Выводит шаблон с группами постов"""
     group = get_object_or_404(Group, slug=slug)
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': get_page_context(group.posts.all(), request),
+        'page_obj': get_page_context(
+            group.posts.with_related(), request),
     })
 
 
+@query_budget(6, time_ms=50)
+@cache_page_versioned(
+    lambda request, username: [author_scope(username), GROUPS],
+    soft_ttl=settings.PAGE_CACHE_SOFT_TTL
+)
 def profile(request, username):
     """Выводит шаблон профайла пользователя"""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('profile_stats'), username=username
+    )
     return render(request, 'posts/profile.html', {
         'author': author,
-        'page_obj': get_page_context(author.posts.all(), request),
+        'stats': ProfileStats.objects.for_user(author),
+        'page_obj': get_page_context(
+            author.posts.with_related(), request),
         'following': (
             request.user.is_authenticated
             and author != request.user
-            and Follow.objects.filter(
-                author=author,
-                user=request.user
-            ).exists()
-        )
+            and follow_graph.is_following(request.user.pk, author.pk)
+        ),
+    })
+
+
+@query_budget(4, time_ms=50)
+@cache_page_versioned(
+    lambda request: [GLOBAL, GROUPS],
+    soft_ttl=settings.PAGE_CACHE_SOFT_TTL
+)
+def search(request):
+    """Выводит записи, найденные по запросу, от самых релевантных"""
+    query = request.GET.get('q', '').strip()
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': ScoreCursorPaginator(
+            Post.objects.with_related().search(query),
+            settings.NUM_POSTS_PER_PAGE, ('search_score', 'pk')
+        ).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        ),
     })
 
 
+# Один запрос из бюджета — просмотры записи.
+@query_budget(5, time_ms=50)
+@analytics.counts_views
+@cache_page_versioned(lambda request, post_id: [
+    post_scope(post_id), author_scope(post_author(post_id)), GROUPS
+], soft_ttl=settings.PAGE_CACHE_SOFT_TTL)
 def post_detail(request, post_id):
     """Выводит шаблон с подробной информацией поста"""
+    post = get_object_or_404(Post.objects.with_details(), pk=post_id)
+    views, visitors = analytics.totals(post.pk)
     return render(request, 'posts/post_detail.html', {
-        'post': get_object_or_404(Post, pk=post_id),
+        'post': post,
         'form': CommentForm(),
+        'views': views,
+        'visitors': visitors,
+    })
+
+
+@query_budget(2, time_ms=50)
+@cache_page_versioned(
+    lambda request, post_id: [comments_scope(post_id)], per_user=False
+)
+def post_comments(request, post_id):
+    """Выводит фрагмент с очередной порцией комментариев записи"""
+    # Пустой фрагмент несуществующей записи попал бы в кеш.
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return render(request, 'posts/includes/comment_list.html', {
+        'post_id': post_id,
+        'page_obj': CursorPaginator(
+            Comment.objects.filter(post_id=post_id).select_related('author'),
+            settings.NUM_COMMENTS_PER_PAGE
+        ).get_page(after=request.GET.get('after')),
     })
 
 
+@query_budget(10, time_ms=100)
 @login_required
+@rate_limit(user='10/h', ip='60/h', methods=('POST',))
 def post_create(request):
     """Создает пост"""
     form = PostForm(request.POST or None,
@@ -71,6 +197,7 @@ def post_create(request):
     return redirect('posts:profile', post.author)
 
 
+@query_budget(10, time_ms=100)
 @login_required
 def post_edit(request, post_id):
     """Редактирует пост"""
@@ -89,7 +216,9 @@ def post_edit(request, post_id):
     return redirect('posts:post_detail', post.pk)
 
 
+@query_budget(6, time_ms=100)
 @login_required
+@rate_limit(user='10/m', ip='60/m')
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -101,17 +230,54 @@ def add_comment(request, post_id):
         return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(4, time_ms=100)
+@staff_member_required
+def post_views_report(request):
+    """Выводит самые просматриваемые записи за последние дни"""
+    try:
+        days = max(1, int(request.GET.get('days', settings.ANALYTICS_DAYS)))
+    except ValueError:
+        days = settings.ANALYTICS_DAYS
+    return render(request, 'posts/post_views_report.html', {
+        'days': days,
+        'posts': analytics.report(days, settings.NUM_ANALYTICS_POSTS),
+    })
+
+
+# Два запроса из бюджета — перестройка графа подписок после потери кеша.
+@query_budget(5, time_ms=50)
+def suggestions(request):
+    """Выводит фрагмент с рекомендуемыми авторами.
+
+    Рекомендации меняются вместе с подписками чужих авторов, поэтому
+    фрагмент не кешируется вместе со страницей профиля.
+    """
+    return render(request, 'posts/includes/suggested_authors.html', {
+        'suggested_authors': suggested_authors(request.user),
+    })
+
+
+# Два запроса из бюджета — перестройка графа подписок после потери кеша.
+@query_budget(6, time_ms=50)
 @login_required
 def follow_index(request):
     return render(
         request, 'posts/follow.html',
         {'page_obj': get_page_context(
-            Post.objects.filter(author__following__user=request.user),
-            request)}
+            Post.objects.with_related().filter(
+                timeline_entries__user=request.user
+            ).annotate(
+                feed_date=F('timeline_entries__pub_date'),
+                feed_post=F('timeline_entries__post_id'),
+            ),
+            request, keys=('feed_date', 'feed_post')),
+         'suggested_authors': suggested_authors(request.user)}
     )
 
 
+@query_budget(16, time_ms=100)
 @login_required
+@rate_limit(user='30/m', ip='120/m')
 def profile_follow(request, username):
     if request.user.username != username:
         Follow.objects.get_or_create(
@@ -121,6 +287,8 @@ def profile_follow(request, username):
     return redirect('posts:profile', username)
 
 
+# Два запроса из бюджета — перестройка графа подписок для рекомендаций.
+@query_budget(10, time_ms=100)
 @login_required
 def profile_unfollow(request, username):
     get_object_or_404(
@@ -41,6 +41,9 @@ INTERNAL_IPS = [
 # Application definition
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,7 +85,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+    },
+    # Копия основной базы для проверки чтения с реплик локально:
+    # python manage.py sync_replica и DATABASE_REPLICAS = ['replica'].
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Псевдонимы баз, с которых читают безопасные запросы, см. core.routers.
+DATABASE_REPLICAS = []
+# Сколько секунд после изменяющего запроса посетитель читает с основной
+# базы; должно быть больше отставания реплик.
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'primary_pin'
+
+# PRAGMA для каждого нового соединения SQLite, см. core.sqlite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение задает размер в КиБ, а не в страницах.
+    'cache_size': -32 * 1024,
+    'busy_timeout': 5000,
 }
 
 
@@ -135,12 +165,18 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Сессия и пользователь запроса читаются из кеша, см. core.auth.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 60 * 5
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -149,16 +185,60 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUM_POSTS_PER_PAGE = 10
+NUM_COMMENTS_PER_PAGE = 20
+NUM_SUGGESTED_AUTHORS = 5
+NUM_TRENDING_POSTS = 10
+NUM_TRENDING_GROUPS = 5
+NUM_ANALYTICS_POSTS = 50
+ANALYTICS_DAYS = 7
 
 IMAGE_PATH = 'posts/'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_QUEUE_SIZE = 100
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Тесты переносят файлы кеша, метрик и медленных запросов во временный
+# каталог, см. core.testing.
+TEST_RUNNER = 'core.testing.TestRunner'
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+PAGE_CACHE_SOFT_TTL = 60 * 5
+
+# Активность в популярном затухает вдвое за TRENDING_HALF_LIFE секунд;
+# процесс сохраняет свои счетчики в базу раз в TRENDING_FLUSH_INTERVAL,
+# блок популярного на главной живет в кеше TRENDING_CACHE_TIMEOUT.
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_FLUSH_INTERVAL = 10
+TRENDING_CACHE_TIMEOUT = 60
+
+# Процесс сохраняет накопленные просмотры записей раз в
+# ANALYTICS_FLUSH_INTERVAL секунд, см. posts.analytics.
+ANALYTICS_FLUSH_INTERVAL = 10
+
+# False отключает лимиты core.ratelimit.rate_limit, например для нагрузочных
+# прогонов с одного адреса.
+RATE_LIMIT_ENABLED = True
+
+# Файл метрик, общий для процессов, и как часто процесс пишет в него.
+METRICS_LOCATION = os.path.join(BASE_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 1
+
+# Запросы дольше SLOW_QUERY_MS миллисекунд попадают в журнал медленных
+# запросов; None отключает замеры.
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOCATION = os.path.join(BASE_DIR, 'slow_queries.sqlite3')